@@ -0,0 +1,251 @@
+import functools
+import hashlib
+import os
+import numpy as np
+from datasets import load_columns, load_dataset
+
+CACHE_DIR = os.path.join("Data", "Cache", "analysis")
+GRID_SIZE = 20                  # Side of the occupancy grid squares in pixels
+THETA_BINS = 16
+HASH_CHUNK = 2 ** 20            # Bytes read at a time when hashing a dataset
+
+
+def content_hash(path):
+    """Hash of a recording's contents (.csv file, or every column of a .traj directory)
+
+    Args:
+        path (str): Recording path
+
+    Returns:
+        str: Hex digest
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    files = [os.path.join(path, name) for name in sorted(os.listdir(path))] if os.path.isdir(path) else [path]
+    for file in files:
+        digest.update(os.path.basename(file).encode())
+        with open(file, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def code_hash():
+    """Hash of this module's source, part of the key of every memoised statistic so that editing how a
+    statistic is computed recomputes it
+    """
+    with open(__file__, 'rb') as f:
+        return hashlib.blake2b(f.read(), digest_size=8).hexdigest()
+
+
+def step_groups(time_step):
+    """Groups recorded rows by time step
+
+    Args:
+        time_step (array): TimeStep column
+
+    Returns:
+        tuple: Sorted unique time steps, the group of every row and the rows per group
+    """
+    steps, group = np.unique(time_step, return_inverse=True)
+    return steps, group, np.bincount(group, minlength=len(steps))
+
+
+def step_mean(group, counts, values):
+    return np.bincount(group, values, len(counts)) / counts
+
+
+def occupancy_grid(x, y, grid_size=GRID_SIZE):
+    """Counts the recorded positions in every grid square, keeping only the rows and columns of squares that
+    were ever occupied (as grouping the binned co-ordinates and unstacking does)
+
+    Args:
+        x (array): X co-ordinates
+        y (array): Y co-ordinates
+        grid_size (int, optional): Side of the grid squares. Defaults to GRID_SIZE.
+
+    Returns:
+        tuple: Counts (one row per grid Y, one column per grid X) and the grid X and Y co-ordinates
+    """
+    cell_x = np.floor_divide(x, grid_size).astype(np.int64)
+    cell_y = np.floor_divide(y, grid_size).astype(np.int64)
+    if not len(cell_x):
+        return np.zeros((0, 0), dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    left, top = cell_x.min(), cell_y.min()
+    width, height = cell_x.max() - left + 1, cell_y.max() - top + 1
+    counts = np.bincount((cell_y - top) * width + (cell_x - left), minlength=width * height).reshape(height, width)
+    columns, rows = np.flatnonzero(counts.any(axis=0)), np.flatnonzero(counts.any(axis=1))
+    return counts[np.ix_(rows, columns)], (left + columns) * grid_size, (top + rows) * grid_size
+
+
+def order_series(time_step, theta):
+    """Vicsek order, the norm of the mean heading vector, at every time step
+
+    Returns:
+        tuple: Time steps and order
+    """
+    steps, group, counts = step_groups(time_step)
+    order = np.hypot(step_mean(group, counts, np.cos(theta)), step_mean(group, counts, np.sin(theta)))
+    return steps, order
+
+
+def theta_histogram(theta, num_bins=THETA_BINS):
+    """Histogram of the headings over [0, 2 pi] and their mean
+
+    Returns:
+        tuple: Counts, bin edges and mean heading
+    """
+    step = 2 * np.pi / num_bins
+    edges = np.arange(0, 2 * np.pi + step, step)
+    counts, _ = np.histogram(theta, edges)
+    return counts, edges, np.mean(theta)
+
+
+def neighbor_series(time_step, neighbors):
+    """Mean neighbour count and number of bots without neighbours at every time step
+
+    Returns:
+        tuple: Time steps, mean counts and zero counts
+    """
+    steps, group, counts = step_groups(time_step)
+    zeros = np.bincount(group, neighbors == 0, len(steps)).astype(np.int64)
+    return steps, step_mean(group, counts, neighbors), zeros
+
+
+def com_series(time_step, com_x, com_y):
+    """Mean recorded centre of mass at every time step
+
+    Returns:
+        tuple: Time steps and CoM X and Y co-ordinates
+    """
+    steps, group, counts = step_groups(time_step)
+    return steps, step_mean(group, counts, com_x), step_mean(group, counts, com_y)
+
+
+def error_series(time_step, error):
+    """Mean heading estimation error (ignoring NaNs) and number of NaN estimates at every time step
+
+    Returns:
+        tuple: Time steps, mean errors and NaN counts
+    """
+    steps, group, _ = step_groups(time_step)
+    valid = ~np.isnan(error)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.bincount(group[valid], error[valid], len(steps)) / np.bincount(group[valid], minlength=len(steps))
+    return steps, mean, np.bincount(group, ~valid, len(steps)).astype(np.int64)
+
+
+class DatasetAnalysis():
+
+    """Statistics of one recording, each computed once and memoised in memory and on disk under the hash of
+    the recording's contents and of this module's code, so re-plotting an unchanged dataset never parses it
+    again and a re-recorded dataset or edited statistic is never served stale results
+    """
+    def __init__(self, path, cache_dir=CACHE_DIR) -> None:
+        """Create the analysis; the recording is only read when a statistic is not cached yet
+
+        Args:
+            path (str): Recording path (.csv file or .traj directory)
+            cache_dir (str, optional): Directory of the memoised statistics. Defaults to CACHE_DIR.
+        """
+        self.path = path
+        self.cache_dir = cache_dir
+        self.memo = {}
+        self._digest = None
+        self._data = None
+        self._columns = None
+
+
+    @property
+    def digest(self):
+        if self._digest is None:
+            self._digest = content_hash(self.path)
+        return self._digest
+
+
+    @property
+    def data(self):
+        """The recording as a typed DataFrame, loaded through the dataset cache on first use
+        """
+        if self._data is None:
+            self._data = load_dataset(self.path)
+        return self._data
+
+
+    def column(self, name):
+        """One memory-mapped column of the recording, from the dataset cache
+        """
+        if self._columns is None:
+            self._columns = load_columns(self.path)
+        return np.asarray(self._columns[name])
+
+
+    def cached(self, name, compute, **params):
+        """Returns a memoised statistic, computing and storing it on a miss
+
+        Args:
+            name (str): Statistic name
+            compute (callable): Computes the statistic as a tuple of arrays
+            **params: Parameters of the statistic, part of its cache key
+
+        Returns:
+            tuple: Arrays of the statistic
+        """
+        key = "_".join([name] + [f"{param}={value}" for param, value in sorted(params.items())])
+        if key in self.memo:
+            return self.memo[key]
+
+        path = os.path.join(self.cache_dir, self.digest, f"{key}-{code_hash()}.npz")
+        if os.path.exists(path):
+            with np.load(path) as data:
+                result = tuple(data[f"arr_{i}"] for i in range(len(data.files)))
+        else:
+            result = tuple(np.asarray(array) for array in compute())
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            part = f"{path}.{os.getpid()}.part"
+            with open(part, 'wb') as f:
+                np.savez(f, *result)
+            os.replace(part, path)
+
+        self.memo[key] = result
+        return result
+
+
+    def occupancy(self, grid_size=GRID_SIZE):
+        """See occupancy_grid
+        """
+        return self.cached("occupancy", lambda: occupancy_grid(self.column('X'), self.column('Y'), grid_size),
+                           grid_size=grid_size)
+
+
+    def order(self):
+        """See order_series
+        """
+        return self.cached("order", lambda: order_series(self.column('TimeStep'), self.column('Theta')))
+
+
+    def theta_histogram(self, num_bins=THETA_BINS):
+        """See theta_histogram
+        """
+        return self.cached("theta", lambda: theta_histogram(self.column('Theta'), num_bins), num_bins=num_bins)
+
+
+    def neighbors(self):
+        """See neighbor_series
+        """
+        return self.cached("neighbors", lambda: neighbor_series(self.column('TimeStep'), self.column('Neighbors')))
+
+
+    def com(self):
+        """See com_series
+        """
+        return self.cached("com", lambda: com_series(self.column('TimeStep'), self.column('CoMX'),
+                                                     self.column('CoMY')))
+
+
+    def estimate_errors(self):
+        """See error_series
+        """
+        return self.cached("errors", lambda: error_series(self.column('TimeStep'),
+                                                           self.column('EstimateError').astype(float)))
@@ -0,0 +1,393 @@
+import argparse
+import contextlib
+import copy
+import fnmatch
+import json
+import math
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import numpy as np
+from kilobots import load_config
+
+SWARM_SIZES = (50, 500, 5000, 20000)
+ALIGNMENTS = (0, 1, -1)
+COARSE_RATE = 10                # Physics steps per second of the coarse-timestep cases
+ENSEMBLE_REPLICAS = 32          # Replicas of the 50-bot ensemble case
+ANALYSIS_FILE = "Data/Simulation/sim_data_anti-alignment.csv"
+MIN_REPEATS = 3
+MIN_TIME = 1.0                  # Seconds each case is repeated for (after at least MIN_REPEATS repeats)
+THRESHOLD = 0.2                 # Relative slowdown of the median flagged as a regression
+
+
+class Case():
+
+    """Benchmark case: a setup function returning the callable to time and the number of operations it performs
+    per call (e.g. one detection period of simulation steps), so that results are reported per operation.
+    Cases that write files get a scratch directory, passed to the setup function and removed once the case
+    has been timed.
+    """
+    def __init__(self, name, setup, size=None, scratch=False) -> None:
+        self.name = name
+        self.setup = setup
+        self.size = size
+        self.scratch = scratch
+
+
+def bench_config(num_bots, **simulation):
+    config = copy.deepcopy(load_config())
+    config["simulation"].update(num_bots=num_bots, **simulation)
+    return config
+
+
+def step_case(num_bots, alignment, physics_rate=None, update_order=None):
+    """Simulation step, averaged over one detection period as every bot detects on the same frame
+    """
+    from swarm import SwarmState
+
+    simulation = {} if physics_rate is None else {"physics_rate": physics_rate}
+    if update_order is not None:
+        simulation["update_order"] = update_order
+    swarm = SwarmState(num_bots, bench_config(num_bots, **simulation), seed=0)
+    period = -(-(swarm.adjust_tick_frames + 1) // swarm.frame_step)
+    for _ in range(period):
+        swarm.step(alignment)
+
+    def run():
+        for _ in range(period):
+            swarm.step(alignment)
+
+    return run, period
+
+
+def ensemble_case(num_bots, replicas):
+    """Simulation step of an ensemble of replicas, per replica step, to compare with step_case of one swarm
+    """
+    from swarm import SwarmState
+
+    swarm = SwarmState(num_bots, bench_config(num_bots), seed=list(range(replicas)))
+    period = swarm.adjust_tick_frames + 1
+    for _ in range(period):
+        swarm.step()
+
+    def run():
+        for _ in range(period):
+            swarm.step()
+
+    return run, period * replicas
+
+
+def neighbor_case(num_bots, backend):
+    """Neighbour detection of every bot at once, in isolation from the rest of the step
+    """
+    from swarm import SwarmState
+
+    swarm = SwarmState(num_bots, bench_config(num_bots), seed=0, backend=backend)
+    everyone = np.arange(num_bots)
+    return (lambda: swarm.neighbor_sums(everyone)), 1
+
+
+def collision_case(num_bots):
+    """Collision resolution of a swarm packed at the "dense" spawn preset, restarted from the same overlaps
+    """
+    from collisions import resolve_collisions
+    from spawning import SPAWN_PRESETS, spawn_area
+    from swarm import SwarmState
+
+    config = bench_config(num_bots, spawn_preset="dense")
+    radius = config["kilobots"]["radius"] * config["kilobots"]["scale"]
+    # Domain just large enough to hold the packed swarm clear of its edges
+    side = math.ceil(math.sqrt(spawn_area(num_bots, radius, SPAWN_PRESETS["dense"]["spawn_density"])) + 2 * radius)
+    config["simulation"].update(width=side, height=side)
+    swarm = SwarmState(num_bots, config, seed=0)
+    # Overlap the bots by moving them a few hundred steps at once, without resolving
+    x = swarm.x + 300 * swarm.speed * np.cos(swarm.theta)
+    y = swarm.y + 300 * swarm.speed * np.sin(swarm.theta)
+    return (lambda: resolve_collisions(x.copy(), y.copy(), swarm.radius)), 1
+
+
+def recorder_case(num_bots, record_format, directory):
+    """One 100 ms sample written by the recorder
+    """
+    from recorder import EXTENSIONS, open_recorder
+    from swarm import SwarmState
+
+    swarm = SwarmState(num_bots, bench_config(num_bots), seed=0)
+    aggregates = swarm.aggregate()
+    recorder = open_recorder(os.path.join(directory, f"bench{EXTENSIONS[record_format]}"), record_format)
+
+    def run():
+        recorder.record(0, swarm.x, swarm.y, swarm.theta, swarm.neighbor_count, aggregates.com_x, aggregates.com_y,
+                        swarm.est_heading, swarm.heading_error)
+
+    return run, 1
+
+
+def sensing_case(num_bots, pattern):
+    """Floor sensing and heading estimation of the whole swarm on a background pattern
+    """
+    from simulation import Simulation
+
+    simulation = Simulation(bench_config(num_bots, pattern=pattern), seed=0)
+    for _ in range(10):
+        simulation.step()
+    kilobots = simulation.kilobots
+
+    def run():
+        # Move the bots so that readings keep changing, as they do while running
+        kilobots.x += kilobots.speed * np.cos(kilobots.theta)
+        kilobots.y += kilobots.speed * np.sin(kilobots.theta)
+        simulation.time_step += 1
+        simulation.sense_floor(simulation.time_step)
+
+    return run, 1
+
+
+def load_analysis_data():
+    from recorder import load_dataframe
+    return load_dataframe(ANALYSIS_FILE)
+
+
+def dataset_case(cached, directory=None):
+    """Loading a recording, parsed from CSV or memory-mapped from the typed dataset cache
+    """
+    from datasets import load_dataset
+
+    if not cached:
+        from recorder import load_dataframe
+
+        return lambda: load_dataframe(ANALYSIS_FILE), 1
+
+    load_dataset(ANALYSIS_FILE, directory)
+
+    def run():
+        return load_dataset(ANALYSIS_FILE, directory)
+
+    return run, 1
+
+
+def heatmap_case():
+    """Occupancy grid of every recorded position, as plotted by data_plots_simulation.heatmap_align_anti
+    """
+    from analysis import occupancy_grid
+
+    df = load_analysis_data()
+    x, y = df['X'].to_numpy(), df['Y'].to_numpy()
+
+    def run():
+        return occupancy_grid(x, y)
+
+    return run, 1
+
+
+def vicsek_case():
+    """Vicsek order per time step, as plotted by data_plots_simulation.vicsek_order_two_plot
+    """
+    from analysis import order_series
+
+    df = load_analysis_data()
+    time_step, theta = df['TimeStep'].to_numpy(), df['Theta'].to_numpy()
+
+    def run():
+        return order_series(time_step, theta)
+
+    return run, 1
+
+
+def neighbors_case():
+    """Mean and zero neighbour counts per time step, as plotted by data_plots_simulation.kilobot_two_neighbor_plot
+    """
+    from analysis import neighbor_series
+
+    df = load_analysis_data()
+    time_step, neighbors = df['TimeStep'].to_numpy(), df['Neighbors'].to_numpy()
+
+    def run():
+        return neighbor_series(time_step, neighbors)
+
+    return run, 1
+
+
+def cached_analysis_case(directory):
+    """Every statistic of a dataset served from the on-disk analysis cache, as when re-plotting
+    """
+    from analysis import DatasetAnalysis
+
+    stats = ("occupancy", "order", "theta_histogram", "neighbors", "com", "estimate_errors")
+    for statistic in stats:
+        getattr(DatasetAnalysis(ANALYSIS_FILE, directory), statistic)()
+
+    def run():
+        analysis = DatasetAnalysis(ANALYSIS_FILE, directory)
+        return [getattr(analysis, statistic)() for statistic in stats]
+
+    return run, 1
+
+
+def benchmark_cases():
+    """Every benchmark case, named <group>/<parameters>
+
+    Returns:
+        list: Cases in run order
+    """
+    cases = []
+    for num_bots in SWARM_SIZES:
+        for alignment in ALIGNMENTS:
+            cases.append(Case(f"step/n={num_bots}/alignment={alignment}",
+                              lambda n=num_bots, a=alignment: step_case(n, a), size=num_bots))
+        cases.append(Case(f"step/n={num_bots}/alignment=-1/rate={COARSE_RATE}",
+                          lambda n=num_bots: step_case(n, -1, COARSE_RATE), size=num_bots))
+        cases.append(Case(f"step/n={num_bots}/alignment=-1/order=simultaneous",
+                          lambda n=num_bots: step_case(n, -1, update_order="simultaneous"), size=num_bots))
+    cases.append(Case(f"ensemble/n=50/replicas={ENSEMBLE_REPLICAS}", lambda: ensemble_case(50, ENSEMBLE_REPLICAS),
+                      size=50))
+    for num_bots in SWARM_SIZES:
+        for backend in ("brute", "grid", "kdtree"):
+            if backend == "brute" and num_bots > 5000:
+                continue
+            cases.append(Case(f"neighbor_detect/n={num_bots}/backend={backend}",
+                              lambda n=num_bots, b=backend: neighbor_case(n, b), size=num_bots))
+    for num_bots in (500, 5000):
+        cases.append(Case(f"collisions/n={num_bots}", lambda n=num_bots: collision_case(n), size=num_bots))
+    for record_format in ("csv", "npy"):
+        cases.append(Case(f"recorder/n=500/format={record_format}",
+                          lambda directory, f=record_format: recorder_case(500, f, directory), size=500, scratch=True))
+    for num_bots in (500, 5000):
+        for pattern in (1, 2):
+            cases.append(Case(f"sensing/n={num_bots}/pattern={pattern}",
+                              lambda n=num_bots, p=pattern: sensing_case(n, p), size=num_bots))
+    cases.append(Case("dataset/read_csv", lambda: dataset_case(False)))
+    cases.append(Case("dataset/cached", lambda directory: dataset_case(True, directory), scratch=True))
+    cases.append(Case("analysis/heatmap", heatmap_case))
+    cases.append(Case("analysis/vicsek_order", vicsek_case))
+    cases.append(Case("analysis/neighbors", neighbors_case))
+    cases.append(Case("analysis/cached", cached_analysis_case, scratch=True))
+    return cases
+
+
+def time_case(case, min_time=MIN_TIME, min_repeats=MIN_REPEATS):
+    """Times a case, repeating it until both min_time and min_repeats are reached
+
+    Returns:
+        dict: Timing statistics in seconds per operation
+    """
+    with contextlib.ExitStack() as stack:
+        if case.scratch:
+            run, inner = case.setup(stack.enter_context(tempfile.TemporaryDirectory()))
+        else:
+            run, inner = case.setup()
+        run()                                   # Warm up caches and lazy imports
+
+        samples = []
+        start = time.perf_counter()
+        while len(samples) < min_repeats or time.perf_counter() - start < min_time:
+            tic = time.perf_counter()
+            run()
+            samples.append((time.perf_counter() - tic) / inner)
+
+    return {
+        "median": statistics.median(samples),
+        "min": min(samples),
+        "mean": statistics.fmean(samples),
+        "stdev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        "repeats": len(samples),
+        "inner": inner,
+    }
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def run_benchmarks(patterns=("*",), max_size=None, min_time=MIN_TIME):
+    """Runs the benchmark cases whose names match any of the glob patterns
+
+    Args:
+        patterns (iterable, optional): Case name globs. Defaults to every case.
+        max_size (int, optional): Skip cases with more bots than this. Defaults to None.
+        min_time (float, optional): Seconds to repeat each case for. Defaults to MIN_TIME.
+
+    Returns:
+        dict: Environment and results per case name
+    """
+    results = {}
+    for case in benchmark_cases():
+        if not any(fnmatch.fnmatch(case.name, pattern) for pattern in patterns):
+            continue
+        if max_size is not None and case.size is not None and case.size > max_size:
+            continue
+        try:
+            results[case.name] = time_case(case, min_time)
+        except FileNotFoundError as error:
+            print(f"{case.name:45s} skipped ({error})")
+            continue
+        print(f"{case.name:45s} {results[case.name]['median'] * 1e3:10.3f} ms")
+    return {"environment": environment(), "results": results}
+
+
+def compare(results, baseline, threshold=THRESHOLD):
+    """Compares the median of every case against a baseline
+
+    Args:
+        results (dict): Output of run_benchmarks
+        baseline (dict): Earlier output of run_benchmarks
+        threshold (float, optional): Relative slowdown flagged as a regression. Defaults to THRESHOLD.
+
+    Returns:
+        list: Names of the regressed cases
+    """
+    regressions = []
+    print(f"\n{'case':45s} {'baseline':>10s} {'current':>10s} {'change':>8s}")
+    for name, result in results["results"].items():
+        if name not in baseline["results"]:
+            continue
+        before, after = baseline["results"][name]["median"], result["median"]
+        change = after / before - 1
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:45s} {before * 1e3:10.3f} {after * 1e3:10.3f} {change:+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the simulation step, neighbour search, collisions, "
+                                                 "recorder, pattern sensing and analysis")
+    parser.add_argument("--filter", nargs="+", default=["*"], metavar="GLOB",
+                        help="Only run cases whose names match, e.g. 'step/*' 'neighbor_detect/n=5000/*'")
+    parser.add_argument("--max-bots", type=int, default=None, help="Skip cases with more bots than this")
+    parser.add_argument("--min-time", type=float, default=MIN_TIME, help="Seconds to repeat each case for")
+    parser.add_argument("--output", default=None, help="Write the results to this JSON file")
+    parser.add_argument("--compare", default=None, metavar="BASELINE",
+                        help="Flag cases more than --threshold slower than a baseline JSON file")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help="Relative slowdown of the median flagged as a regression")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.filter, args.max_bots, args.min_time)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=4)
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) above {args.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+
+    main()
@@ -0,0 +1,77 @@
+import copy
+import json
+import os
+import numpy as np
+from simulation import Simulation
+from swarm import SwarmState
+
+CHECKPOINT_VERSION = 3
+TOGGLES = ("paused", "tumbling", "detecting", "alignment")
+
+
+def save_checkpoint(simulation, path, recorder=None, metrics=None):
+    """Saves the full simulation state (swarm arrays, scheduled events, trails, RNG state, toggles and
+    configuration) to a compressed .npz file. The file is written atomically, so an interrupted save leaves the
+    previous checkpoint intact.
+
+    Args:
+        simulation (Simulation): Simulation to save, between two steps
+        path (str): Checkpoint path
+        recorder (optional): Open recorder, flushed so that a resumed run continues its output. Defaults to None.
+        metrics (MetricsStream, optional): Open metrics stream, continued likewise. Defaults to None.
+    """
+    arrays, swarm_meta = simulation.kilobots.get_state()
+    meta = {
+        "version": CHECKPOINT_VERSION,
+        "config": simulation.config,
+        "time_step": simulation.time_step,
+        "toggles": {name: getattr(simulation, name) for name in TOGGLES},
+        "swarm": swarm_meta,
+        "resume": {
+            "recorder": recorder.checkpoint() if recorder is not None else None,
+            "metrics": metrics.checkpoint() if metrics is not None else None,
+        },
+    }
+    arrays["meta"] = np.frombuffer(json.dumps(meta).encode(), dtype=np.uint8)
+
+    with open(path + ".part", 'wb') as f:
+        np.savez_compressed(f, **arrays)
+    os.replace(path + ".part", path)
+
+
+def load_checkpoint(path, config=None, seed=None):
+    """Restores a simulation saved by save_checkpoint
+
+    Without a configuration the simulation resumes bit-exactly, including its toggles and the outputs it was
+    recording. With one, a variant is forked from the saved state: the swarm switches to the new Kilobot
+    parameters (see SwarmState.reconfigure), toggles come from the new configuration and outputs start afresh.
+
+    Args:
+        path (str): Checkpoint path
+        config (dict, optional): Configuration to fork a variant with. Defaults to None (resume).
+        seed (optional): Reseeds the swarm random number generator, e.g. to fork replicas. Defaults to None
+            (continue the saved random stream).
+
+    Returns:
+        Simulation: Restored simulation, ready to step
+    """
+    with np.load(path, allow_pickle=False) as data:
+        arrays = {name: data[name] for name in data.files}
+    meta = json.loads(arrays.pop("meta").tobytes().decode())
+    if meta["version"] != CHECKPOINT_VERSION:
+        raise ValueError(f"Unsupported checkpoint version {meta['version']}, expected {CHECKPOINT_VERSION}")
+
+    kilobots = SwarmState.from_state(arrays, meta["swarm"])
+    if config is not None:
+        config = copy.deepcopy(config)
+        kilobots.reconfigure(config)
+    if seed is not None:
+        kilobots.reseed(seed)
+
+    simulation = Simulation(config or meta["config"], kilobots=kilobots)
+    simulation.time_step = meta["time_step"]
+    if config is None:
+        for name, value in meta["toggles"].items():
+            setattr(simulation, name, value)
+        simulation.resume = {name: state for name, state in meta["resume"].items() if state is not None}
+    return simulation
@@ -0,0 +1,76 @@
+import numpy as np
+from spatial import NeighborIndex, wrap
+
+COLLISION_ITERATIONS = 4        # Relaxation sweeps over the contacts found per step
+CONTACT_MARGIN = 1.25           # Contacts are gathered out to this multiple of the contact distance, so that
+                                # pairs pushed together by another contact during the sweeps are caught too
+
+
+def confine(x, y, radius, width, height):
+    """Pushes bots overlapping a domain wall back inside, in place
+
+    Args:
+        x (array): X co-ordinates
+        y (array): Y co-ordinates
+        radius (float): Kilobot radius
+        width (float): Domain width
+        height (float): Domain height
+    """
+    np.clip(x, radius, width - radius, out=x)
+    np.clip(y, radius, height - radius, out=y)
+
+
+def resolve_collisions(x, y, radius, backend="grid", walls=None, period=None, groups=None,
+                       iterations=COLLISION_ITERATIONS):
+    """Separates overlapping Kilobots by positional correction, in place. Candidate contacts are gathered once
+    from a spatial index, then every sweep moves each bot of an overlapping pair half the overlap apart along
+    the line between their centres (summed over all of a bot's contacts), so the cost per step is linear in the
+    number of bots and contacts.
+
+    Args:
+        x (array): X co-ordinates
+        y (array): Y co-ordinates
+        radius (float): Kilobot radius (bots closer than 2 * radius overlap)
+        backend (str, optional): Neighbour search backend. Defaults to "grid".
+        walls (tuple, optional): Domain width and height to also confine the bots to. Defaults to None.
+        period (tuple, optional): Width and height of a periodic domain, in which bots collide with the nearest
+            image of each other and are wrapped back into the domain. Defaults to None.
+        groups (array, optional): Group of each bot (e.g. its ensemble replica); only bots of the same group
+            collide. Defaults to None.
+        iterations (int, optional): Relaxation sweeps. Defaults to COLLISION_ITERATIONS.
+
+    Returns:
+        int: Number of overlapping pairs found on the first sweep
+    """
+    contact = 2 * radius
+    index = NeighborIndex(x, y, contact * CONTACT_MARGIN, backend, period, groups)
+    rows, cols = index.query_pairs()
+    pair = rows < cols
+    first, second = rows[pair], cols[pair]
+    num_bots = len(x)
+    overlapping = 0
+
+    for sweep in range(iterations):
+        dx, dy = index.separation(x[second] - x[first], y[second] - y[first])
+        distance = np.hypot(dx, dy)
+        touching = distance < contact
+        if sweep == 0:
+            overlapping = int(np.count_nonzero(touching))
+        if not touching.any():
+            break
+
+        dx, dy, distance = dx[touching], dy[touching], distance[touching]
+        # Coincident bots are separated along the x axis
+        with np.errstate(invalid="ignore", divide="ignore"):
+            normal_x = np.where(distance > 0, dx / distance, 1.0)
+            normal_y = np.where(distance > 0, dy / distance, 0.0)
+        push = (contact - distance) / 2
+        i, j = first[touching], second[touching]
+        x += np.bincount(j, push * normal_x, num_bots) - np.bincount(i, push * normal_x, num_bots)
+        y += np.bincount(j, push * normal_y, num_bots) - np.bincount(i, push * normal_y, num_bots)
+        if walls is not None:
+            confine(x, y, radius, *walls)
+        if period is not None:
+            x[:], y[:] = wrap(x, period[0]), wrap(y, period[1])
+
+    return overlapping
@@ -1,4 +1,3 @@
-import math
 import random
 import numpy as np
 import pandas as pd
@@ -10,8 +9,16 @@ from kilobots import frames_to_milliseconds
 plt.rcParams.update({"text.usetex": True, 'font.size': 16})
 
 
-def one_bot_path(df):
+def heatmap_frame(analysis, grid_size=20):
+    """Occupancy grid of a dataset as a DataFrame labelled with the grid co-ordinates, for sns.heatmap
+    """
+    counts, grid_x, grid_y = analysis.occupancy(grid_size)
+    return pd.DataFrame(counts, index=pd.Index(grid_y, name='GridY'), columns=pd.Index(grid_x, name='GridX'))
 
+
+def one_bot_path(analysis):
+
+    df = analysis.data
     fig, axs = plt.subplots(1, 2, figsize=(14, 8))
 
     axs[0].plot(df['X'], df['Y'], linestyle='-', linewidth=1, label="Kilobot Path")
@@ -40,23 +47,15 @@ def one_bot_path(df):
     plt.savefig("Results/RunAndTumble.png")
 
 
-def heatmap_align_anti(df_align, df_anti):
+def heatmap_align_anti(align, anti):
     fig, axs = plt.subplots(1, 2, figsize=(14, 10))
 
-    grid_size = 20
-
-    df_align['GridX'] = (df_align['X'] // grid_size) * grid_size
-    df_align['GridY'] = (df_align['Y'] // grid_size) * grid_size
-
-    df_anti['GridX'] = (df_anti['X'] // grid_size) * grid_size
-    df_anti['GridY'] = (df_anti['Y'] // grid_size) * grid_size
-
-    df_align = df_align.groupby(['GridY', 'GridX']).size().unstack(fill_value=0)
-    df_anti = df_anti.groupby(['GridY', 'GridX']).size().unstack(fill_value=0)
+    df_align = heatmap_frame(align)
+    df_anti = heatmap_frame(anti)
 
     cmap = 'inferno'
     vmin = 0
-    vmax = np.max(df_anti)
+    vmax = df_anti.to_numpy().max()
 
     sns.heatmap(df_align, cmap=cmap, annot=False,
                 ax=axs[0], cbar=False, vmin=vmin,
@@ -85,23 +84,15 @@ def heatmap_align_anti(df_align, df_anti):
     plt.savefig("Results/HeatmapAlignAnti")   
 
 
-def heatmap_anti_no(df_anti, df_no):
+def heatmap_anti_no(anti, no):
     fig, axs = plt.subplots(1, 2, figsize=(14, 10))
 
-    grid_size = 20
-
-    df_anti['GridX'] = (df_anti['X'] // grid_size) * grid_size
-    df_anti['GridY'] = (df_anti['Y'] // grid_size) * grid_size
-
-    df_no['GridX'] = (df_no['X'] // grid_size) * grid_size
-    df_no['GridY'] = (df_no['Y'] // grid_size) * grid_size
-
-    df_anti = df_anti.groupby(['GridY', 'GridX']).size().unstack(fill_value=0)
-    df_no = df_no.groupby(['GridY', 'GridX']).size().unstack(fill_value=0)
+    df_anti = heatmap_frame(anti)
+    df_no = heatmap_frame(no)
 
     cmap = 'inferno'
     vmin = 0
-    vmax = np.max(df_anti)
+    vmax = df_anti.to_numpy().max()
 
     sns.heatmap(df_anti, cmap=cmap, annot=False,
                 ax=axs[0], cbar=False, vmin=vmin,
@@ -130,17 +121,14 @@ def heatmap_anti_no(df_anti, df_no):
     plt.savefig("Results/HeatmapAntiNo")   
 
 
-def com_align_anti(df_align, df_anti):
+def com_align_anti(align, anti):
     fig, axs = plt.subplots(1, 2, figsize=(14, 6))
 
-    com_align = df_align[['TimeStep', 'CoMX', 'CoMY']]
-    com_align = com_align.groupby('TimeStep')[['CoMX', 'CoMY']].mean()
+    _, align_x, align_y = align.com()
+    _, anti_x, anti_y = anti.com()
 
-    com_anti = df_anti[['TimeStep', 'CoMX', 'CoMY']]
-    com_anti = com_anti.groupby('TimeStep')[['CoMX', 'CoMY']].mean()
-
-    axs[0].plot(com_align['CoMX'], com_align['CoMY'], marker='o', label="CoM Alignment")
-    axs[0].plot(com_anti['CoMX'], com_anti['CoMY'], marker='o', label="CoM Anti-Alignment")
+    axs[0].plot(align_x, align_y, marker='o', label="CoM Alignment")
+    axs[0].plot(anti_x, anti_y, marker='o', label="CoM Anti-Alignment")
     axs[0].set_title("Full Domain")
     axs[0].set_xlabel("X (pixels)")
     axs[0].set_ylabel("Y (pixels)")
@@ -149,8 +137,8 @@ def com_align_anti(df_align, df_anti):
     axs[0].grid()
     axs[0].legend()
 
-    axs[1].plot(com_align['CoMX'], com_align['CoMY'], marker='o', label="CoM Alignment")
-    axs[1].plot(com_anti['CoMX'], com_anti['CoMY'], marker='o', label="CoM Anti-Alignment")
+    axs[1].plot(align_x, align_y, marker='o', label="CoM Alignment")
+    axs[1].plot(anti_x, anti_y, marker='o', label="CoM Anti-Alignment")
     axs[1].set_title("Sub-Domain")
     axs[1].set_xlabel("X (pixels)")
     axs[1].set_ylabel("Y (pixels)")
@@ -163,23 +151,15 @@ def com_align_anti(df_align, df_anti):
     plt.savefig("Results/CoMTwoPlot")   
     
 
-def vicsek_order_two_plot(df_data, df_names):
+def vicsek_order_two_plot(analyses, df_names):
     fig, axs = plt.subplots(1, 2, figsize=(14, 8))
 
-    for i, df in enumerate(df_data):
-
-        vicsek_order = df[["TimeStep", "Theta"]]
-
-        vicsek_order['Cos_Theta'] = np.cos(vicsek_order['Theta'])
-        vicsek_order['Sin_Theta'] = np.sin(vicsek_order['Theta'])
-
-        vicsek_order = vicsek_order.groupby('TimeStep')[['Cos_Theta', 'Sin_Theta']].mean()    
-        vicsek_order['Norm'] = np.linalg.norm(vicsek_order[['Cos_Theta', 'Sin_Theta']], axis=1)
+    for i, analysis in enumerate(analyses):
 
-        mean_corr = np.mean(vicsek_order['Norm'])
-
-        time = frames_to_milliseconds(np.array(vicsek_order.index, dtype=int))
-        axs[i].plot(time, vicsek_order['Norm'], marker='o', linestyle='-', label="Current $v_a$")
+        time_step, order = analysis.order()
+        mean_corr = np.mean(order)
+        time = frames_to_milliseconds(time_step)
+        axs[i].plot(time, order, marker='o', linestyle='-', label="Current $v_a$")
         axs[i].axhline(y=mean_corr, color='red', linestyle='--', label=f"Average $v_a = {mean_corr:.3f}$")
 
         axs[i].set_title(f"{df_names[i]}")
@@ -195,23 +175,18 @@ def vicsek_order_two_plot(df_data, df_names):
     plt.savefig(f"Results/OrderTwoPlot.png")   
 
 
-def theta_two_plot(df_data, df_names):
+def theta_two_plot(analyses, df_names):
     fig, axs = plt.subplots(1, 2, subplot_kw={'projection': 'polar'}, figsize=(14, 6))
 
-    for i, df in enumerate(df_data):
+    for i, analysis in enumerate(analyses):
 
-        theta = df[["Theta"]]
-        num_bins = 16
+        counts, bins, avg_theta = analysis.theta_histogram(16)
 
         axs[i].set_theta_zero_location('E')
         axs[i].set_theta_direction(1)
 
-        step = 2*math.pi/num_bins
-        bins = np.arange(0, 2*math.pi + step, step)
-        
-        avg_theta = theta.mean()
-        avg_theta = round(avg_theta[0], 2)
-        axs[i].hist(theta, bins=bins, label=f"$\\theta$ count")
+        avg_theta = round(float(avg_theta), 2)
+        axs[i].hist(bins[:-1], bins=bins, weights=counts, label=f"$\\theta$ count")
         axs[i].set_xticklabels([r'$0$', r'$\frac{\pi}{4}$', r'$\frac{\pi}{2}$', r'$\frac{3\pi}{4}$', r'$\pi$',
                         r'$\frac{5\pi}{4}$', r'$\frac{3\pi}{2}$', r'$\frac{7\pi}{4}$'])
         axs[i].set_title(f"{df_names[i]} ($\\theta_{{mean}} = {avg_theta}$)")
@@ -223,25 +198,17 @@ def theta_two_plot(df_data, df_names):
     plt.savefig(f"Results/ThetaTwoPlot.png")
 
 
-def vicsek_order_one_plot(df_data, df_names):
+def vicsek_order_one_plot(analyses, df_names):
     
     fig, axs = plt.subplots(figsize=(14, 8))
     colors = ['C0', 'C1']
 
-    for i, df in enumerate(df_data):
-
-        vicsek_order = df[["TimeStep", "Theta"]]
-
-        vicsek_order['Cos_Theta'] = np.cos(vicsek_order['Theta'])
-        vicsek_order['Sin_Theta'] = np.sin(vicsek_order['Theta'])
+    for i, analysis in enumerate(analyses):
 
-        vicsek_order = vicsek_order.groupby('TimeStep')[['Cos_Theta', 'Sin_Theta']].mean()    
-        vicsek_order['Norm'] = np.linalg.norm(vicsek_order[['Cos_Theta', 'Sin_Theta']], axis=1)
-
-        mean_corr = np.mean(vicsek_order['Norm'])
-
-        time = frames_to_milliseconds(np.array(vicsek_order.index, dtype=int))
-        plt.plot(time, vicsek_order['Norm'], marker='o', linestyle='-', label=f"{df_names[i]}")
+        time_step, order = analysis.order()
+        mean_corr = np.mean(order)
+        time = frames_to_milliseconds(time_step)
+        plt.plot(time, order, marker='o', linestyle='-', label=f"{df_names[i]}")
         plt.axhline(y=mean_corr, linestyle='--', color=colors[i], label=f"Mean $v_a = {mean_corr:.3f}$")
 
     plt.title(("Time Series of Vicsek Order ($v_a$) of Alignment vs Anti-Alignment Swarms") )
@@ -255,26 +222,22 @@ def vicsek_order_one_plot(df_data, df_names):
     plt.savefig(f"Results/OrderOnePlot.png")   
 
 
-def theta_one_plot(df_data, df_names):
+def theta_one_plot(analyses, df_names):
     
     fig, ax = plt.subplots(subplot_kw={'projection': 'polar'}, figsize=(9, 9))
     
-    num_bins = 16
-    step = 2*math.pi/num_bins
-    bins = np.arange(0, 2*math.pi + step, step)
     avg_thetas = []
     
-    for i, df in enumerate(df_data):
+    for i, analysis in enumerate(analyses):
         
-        theta = df[["Theta"]]
-        avg_theta = theta.mean()
-        avg_theta = round(avg_theta[0], 2)
+        counts, bins, avg_theta = analysis.theta_histogram(16)
+        avg_theta = round(float(avg_theta), 2)
         avg_thetas.append(avg_theta)
 
         ax.set_theta_zero_location('E')
         ax.set_theta_direction(1)
 
-        ax.hist(theta, bins=bins, label=f"$\\theta_{{{df_names[i]}}}$", alpha=1-(i*0.25))
+        ax.hist(bins[:-1], bins=bins, weights=counts, label=f"$\\theta_{{{df_names[i]}}}$", alpha=1-(i*0.25))
 
     ax.set_xticklabels([r'$0$', r'$\frac{\pi}{4}$', r'$\frac{\pi}{2}$', r'$\frac{3\pi}{4}$', r'$\pi$',
                     r'$\frac{5\pi}{4}$', r'$\frac{3\pi}{2}$', r'$\frac{7\pi}{4}$'])
@@ -286,20 +249,13 @@ def theta_one_plot(df_data, df_names):
     plt.savefig(f"Results/ThetaOnePlot.png")
     
    
-def heatmap_adjust_rates(df_all, df_rates): 
+def heatmap_adjust_rates(analyses, df_rates): 
   
-    grid_size = 20
-    heatmaps = []
+    heatmaps = [heatmap_frame(analysis) for analysis in analyses]
     cmap = 'inferno'
-
-    for df in df_all:
-        df['GridX'] = (df['X'] // grid_size) * grid_size
-        df['GridY'] = (df['Y'] // grid_size) * grid_size
-        
-        heatmaps.append(df.groupby(['GridY', 'GridX']).size().unstack(fill_value=0))
         
     vmin = 0
-    vmax = max(np.max(heatmap) for heatmap in heatmaps)
+    vmax = max(heatmap.to_numpy().max() for heatmap in heatmaps)
 
     fig, axs = plt.subplots(2, 2, figsize=(16, 16))
     
@@ -325,33 +281,24 @@ def heatmap_adjust_rates(df_all, df_rates):
     plt.savefig("Results/HeatmapAdjust")  
   
   
-def sequencing_error_plots(df_triangle, df_intensity):
+def sequencing_error_plots(triangle, intensity):
     fig, axs = plt.subplots(1, 2, figsize=(14, 8))
     
-    sequence_error_triangle = df_triangle[["TimeStep", "EstimateError"]]
-    sequence_error_intensity = df_intensity[["TimeStep", "EstimateError"]]
+    time_step, triangle_error, triangle_nans = triangle.estimate_errors()
+    _, intensity_error, intensity_nans = intensity.estimate_errors()
     
-    sequence_error_triangle = df_triangle.groupby('TimeStep').agg(
-        average_error=('EstimateError', 'mean'),
-        nan_count=('EstimateError', lambda x: x.isna().sum())
-    )
-    sequence_error_intensity = df_intensity.groupby('TimeStep').agg(
-        average_error=('EstimateError', 'mean'),
-        nan_count=('EstimateError', lambda x: x.isna().sum())
-    )
+    time = frames_to_milliseconds(time_step)
     
-    time = frames_to_milliseconds(np.array(sequence_error_triangle.index, dtype=int))
-    
-    axs[0].plot(time, sequence_error_triangle['average_error'], marker='x', color="red", label="Pattern Triangle")
-    axs[0].plot(time, sequence_error_intensity['average_error'], marker='x', color="blue", label="Pattern Intensity")
+    axs[0].plot(time, triangle_error, marker='x', color="red", label="Pattern Triangle")
+    axs[0].plot(time, intensity_error, marker='x', color="blue", label="Pattern Intensity")
     axs[0].set_title("Mean Absolute Error per Time Step")
     axs[0].set_xlabel("Time (ms)")
     axs[0].set_ylabel("Mean Error (Radians)")
     axs[0].grid(True)
     axs[0].legend()   
     
-    axs[1].plot(time, sequence_error_triangle['nan_count'], marker='x', color="red", label="Pattern Triangle")
-    axs[1].plot(time, sequence_error_intensity['nan_count'], marker='x', color="blue", label="Pattern Intensity")
+    axs[1].plot(time, triangle_nans, marker='x', color="red", label="Pattern Triangle")
+    axs[1].plot(time, intensity_nans, marker='x', color="blue", label="Pattern Intensity")
     axs[1].set_title("Total NaN Count per Time Step")
     axs[1].set_xlabel("Time (ms)")
     axs[1].set_ylabel("Count")
@@ -362,15 +309,16 @@ def sequencing_error_plots(df_triangle, df_intensity):
     plt.savefig("Results/PatternErrors.png")   
 
 
-def kilobot_neighbor_plot(df, df_name, num_bots):
+def kilobot_neighbor_plot(analysis, df_name, num_bots, seed=None):
     
+    df = analysis.data
     num_unique = df["KilobotID"].nunique()
-    id_array = [random.randint(0, num_unique) for _ in range(num_bots)]
+    rng = random.Random(seed)
+    id_array = [rng.randrange(num_unique) for _ in range(num_bots)]
     
-    average_neighbor_count = df[["TimeStep", "Neighbors"]]
-    average_neighbor_count = average_neighbor_count.groupby('TimeStep')['Neighbors'].mean()
+    time_step, average_neighbor_count, _ = analysis.neighbors()
     
-    time = frames_to_milliseconds(np.array(average_neighbor_count.index, dtype=int))
+    time = frames_to_milliseconds(time_step)
     
     plt.figure(figsize=(12, 6))
     
@@ -391,22 +339,15 @@ def kilobot_neighbor_plot(df, df_name, num_bots):
     plt.savefig(f"Results/Neighbour{df_name}.png")    
    
 
-def kilobot_two_neighbor_plot(df_data, df_names):
+def kilobot_two_neighbor_plot(analyses, df_names):
     
     fig, axs = plt.subplots(1, 2, figsize=(14, 8))
     
-    for i, df in enumerate(df_data):
-        average_neighbor_count = df[["TimeStep", "Neighbors"]]
-        average_neighbor_count = average_neighbor_count.groupby('TimeStep')['Neighbors'].mean()
-        time = frames_to_milliseconds(np.array(average_neighbor_count.index, dtype=int))
+    for i, analysis in enumerate(analyses):
+        time_step, average_neighbor_count, no_neighbor_count = analysis.neighbors()
+        time = frames_to_milliseconds(time_step)
         
         axs[0].plot(time[1:], average_neighbor_count[1:], marker='o', linestyle="-", label=f"{df_names[i]}")
-    
-    for i, df in enumerate(df_data):
-        no_neighbor_count = df[["TimeStep", "Neighbors"]]
-        no_neighbor_count = no_neighbor_count.groupby('TimeStep').agg(zero_count=('Neighbors', lambda x: (x==0).sum()))
-        time = frames_to_milliseconds(np.array(no_neighbor_count.index, dtype=int))
-           
         axs[1].plot(time[1:], no_neighbor_count[1:], marker='o', linestyle="-", label=f"{df_names[i]}")
 
     for ax in axs:
@@ -418,51 +359,11 @@ def kilobot_two_neighbor_plot(df_data, df_names):
     axs[0].set_title("Mean Neighbour Count")
     axs[1].set_title("Zero Neighbour Count")
     plt.suptitle(f"Time Series of Kilobot Detected Neighbours for Anti-Alignment vs No Alignment")
-    plt.savefig(f"Results/NeighbourPlotTwo.png") 
-    
-    
-         
-# df_one = pd.read_csv("Data\Simulation\sim_data_one_bot.csv")
-
-# one_bot_path(df_one)
-
-# df_align = pd.read_csv("Data\Simulation\sim_data_alignment.csv")
-# df_anti = pd.read_csv("Data\Simulation\sim_data_anti-alignment.csv")
-# df_data = [df_align, df_anti]
-# df_names = ["Alignment", "Anti-Alignment"]
-
-# heatmap_align_anti(df_align, df_anti)
-# com_align_anti(df_align, df_anti)
-# vicsek_order_two_plot(df_data, df_names)
-# theta_two_plot(df_data, df_names)
-# vicsek_order_one_plot(df_data, df_names)
-# theta_one_plot(df_data, df_names)
-# kilobot_neighbor_plot(df=df_align, df_name="Alignment", num_bots=5)
-# kilobot_neighbor_plot(df=df_anti, df_name="Anti-Alignment", num_bots=5)
-
-# df_1000 = pd.read_csv("Data/Simulation/sim_data_adjust_1000.csv")
-# df_2500 = pd.read_csv("Data/Simulation/sim_data_anti-alignment.csv")
-# df_5000 = pd.read_csv("Data/Simulation/sim_data_adjust_5000.csv")
-# df_10000 = pd.read_csv("Data/Simulation/sim_data_adjust_10000.csv")
-# df_all = [df_1000, df_2500, df_5000, df_10000]
-# df_rates = [1000, 2500, 5000, 10000]
-
-# heatmap_adjust_rates(df_all, df_rates)
-
-# df_triangle = pd.read_csv("Data\Simulation\sim_data_triangle_pattern.csv")
-# df_intensity = pd.read_csv("Data\Simulation\sim_data_intensity_pattern.csv")
-
-# sequencing_error_plots(df_triangle, df_intensity)
-
-df_anti = pd.read_csv("Data\Simulation\sim_data_anti-alignment.csv")
-df_no = pd.read_csv("Data\Simulation\sim_data_random_no_boundary.csv")
-df_data = [df_anti, df_no]
-df_names = ["Anti-Alignment", "No Alignment"]
+    plt.savefig(f"Results/NeighbourPlotTwo.png")
 
-# heatmap_anti_no(df_anti, df_no)
-# kilobot_neighbor_plot(df=df_anti, df_name="Anti-Alignment", num_bots=3)
-# kilobot_neighbor_plot(df=df_no, df_name="No Alignment", num_bots=3)
 
-kilobot_two_neighbor_plot(df_data, df_names)
+if __name__ == "__main__":
 
+    from figures import main
 
+    main()
@@ -1,12 +1,24 @@
+import os
 import pandas as pd
 import matplotlib.pyplot as plt
 from matplotlib.animation import FuncAnimation
+from datasets import load_matrix
 
 plt.rcParams.update({"text.usetex": True, 'font.size': 16})
 
-x_csv, y_csv = "Data/Video/x.csv", "Data/Video/y.csv"
-x_df = pd.read_csv(x_csv, header=None)
-y_df = pd.read_csv(y_csv, header=None)
+x_csv, y_csv = os.path.join("Data", "Video", "x.csv"), os.path.join("Data", "Video", "y.csv")
+
+
+def load_track(path):
+    """Loads tracked co-ordinates (one column per Kilobot, one row per frame) through the dataset cache
+
+    Args:
+        path (str): Co-ordinate CSV, e.g. x_csv or y_csv
+
+    Returns:
+        DataFrame: Co-ordinates
+    """
+    return pd.DataFrame(load_matrix(path))
 
 
 def animated_plot(x_df, y_df):
@@ -75,6 +87,9 @@ def static_plot(x_df, y_df):
     plt.savefig("Results/KilobotVideoTrackPlot.png")
 
 
-# static_plot(x_df, y_df)
-# animated_plot(x_df, y_df)
+if __name__ == "__main__":
+
+    from figures import main
+
+    main(["KilobotVideo*"])
 
@@ -0,0 +1,155 @@
+import glob
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+from recorder import load_trajectory
+
+CACHE_DIR = os.path.join("Data", "Cache", "datasets")
+DATASET_COLUMNS = {
+    'TimeStep': np.int32,
+    'KilobotID': np.int16,
+    'X': np.int16,
+    'Y': np.int16,
+    'Theta': np.float32,
+    'Neighbors': np.int16,
+    'CoMX': np.int16,
+    'CoMY': np.int16,
+    'EstimateHeading': np.float32,
+    'EstimateError': np.float32,
+}
+
+
+def cache_entry(path, cache_dir, suffix=""):
+    """Cache path of a source file, keyed on its size and modification time so that an edited or re-recorded
+    source is converted again
+
+    Args:
+        path (str): Source file
+        cache_dir (str): Cache directory
+        suffix (str, optional): Extension of the cache entry. Defaults to "".
+
+    Returns:
+        tuple: Cache path, and the glob of every entry of the same source (current or stale)
+    """
+    source = os.path.abspath(path)
+    stat = os.stat(source)
+    # The path hash tells apart sources of the same name in different directories
+    name = os.path.splitext(os.path.basename(source))[0]
+    stem = f"{name}-{hashlib.blake2b(source.encode(), digest_size=4).hexdigest()}"
+    return (os.path.join(cache_dir, f"{stem}-{stat.st_size}-{stat.st_mtime_ns}{suffix}"),
+            os.path.join(cache_dir, f"{glob.escape(stem)}-*{suffix}"))
+
+
+def publish_entry(part, entry, pattern):
+    """Moves a converted cache entry into place and removes the stale entries of the same source. When another
+    process published the same entry first, this one is discarded.
+    """
+    try:
+        os.replace(part, entry)
+    except OSError:
+        if not os.path.isdir(entry):
+            raise
+        shutil.rmtree(part)
+    for stale in glob.glob(pattern):
+        if stale != entry:
+            shutil.rmtree(stale) if os.path.isdir(stale) else os.remove(stale)
+
+
+def narrow(values, dtype):
+    """Casts a parsed column to its compact dtype, keeping a wider one when the values do not fit (e.g. X
+    co-ordinates beyond the int16 range, or non-integer positions in an integer column)
+
+    Args:
+        values (array): Parsed column
+        dtype (type): Compact dtype
+
+    Returns:
+        array: Typed column
+    """
+    dtype = np.dtype(dtype)
+    if dtype.kind != 'i' or not len(values):
+        return values.astype(dtype)
+    if values.dtype.kind == 'f' and not np.array_equal(values, np.trunc(values)):
+        return values.astype(np.float64)
+    for candidate in (dtype, np.dtype(np.int32), np.dtype(np.int64)):
+        info = np.iinfo(candidate)
+        if info.min <= values.min() and values.max() <= info.max:
+            return values.astype(candidate)
+
+
+def load_columns(path, cache_dir=CACHE_DIR):
+    """Memory-maps the typed columns of a recording. A sim_data CSV is converted once into a cached directory
+    of compact .npy columns (see DATASET_COLUMNS); later loads map that instead of parsing the text again.
+
+    Args:
+        path (str): Recording path (.csv file or .traj directory)
+        cache_dir (str, optional): Cache directory. Defaults to CACHE_DIR.
+
+    Returns:
+        dict: Column name mapped to a read-only memory-mapped array
+    """
+    if os.path.isdir(path):
+        return load_trajectory(path)
+
+    entry, pattern = cache_entry(path, cache_dir, ".traj")
+    if not os.path.isdir(entry):
+        import pandas as pd
+
+        df = pd.read_csv(path)
+        part = f"{entry}.{os.getpid()}.part"
+        os.makedirs(part, exist_ok=True)
+        dtypes = {}
+        for name in df.columns:
+            column = narrow(df[name].to_numpy(), DATASET_COLUMNS.get(name, df[name].dtype))
+            np.save(os.path.join(part, f"{name}.npy"), column)
+            dtypes[name] = column.dtype.str
+        # Same layout as a recorded trajectory
+        with open(os.path.join(part, "meta.json"), 'w') as f:
+            json.dump({"columns": dtypes}, f, indent=4)
+        publish_entry(part, entry, pattern)
+
+    with open(os.path.join(entry, "meta.json"), 'r') as f:
+        names = json.load(f)["columns"]
+    return {name: np.load(os.path.join(entry, f"{name}.npy"), mmap_mode='r') for name in names}
+
+
+def load_dataset(path, cache_dir=CACHE_DIR):
+    """Loads a recording as a typed pandas DataFrame through the dataset cache (see load_columns)
+
+    Args:
+        path (str): Recording path (.csv file or .traj directory)
+        cache_dir (str, optional): Cache directory. Defaults to CACHE_DIR.
+
+    Returns:
+        DataFrame: One row per Kilobot per recorded sample
+    """
+    import pandas as pd
+
+    return pd.DataFrame({name: np.asarray(column) for name, column in load_columns(path, cache_dir).items()})
+
+
+def load_matrix(path, dtype=np.float32, cache_dir=CACHE_DIR):
+    """Memory-maps a headerless numeric CSV (e.g. the video tracker's Data/Video/x.csv, one column per Kilobot
+    and one row per frame), converted once into a cached .npy file
+
+    Args:
+        path (str): CSV path
+        dtype (type, optional): Stored dtype. Defaults to np.float32.
+        cache_dir (str, optional): Cache directory. Defaults to CACHE_DIR.
+
+    Returns:
+        array: Read-only memory-mapped 2D array
+    """
+    entry, pattern = cache_entry(path, cache_dir, f"-{np.dtype(dtype).str[1:]}.npy")
+    if not os.path.exists(entry):
+        import pandas as pd
+
+        matrix = pd.read_csv(path, header=None).to_numpy(dtype)
+        os.makedirs(cache_dir, exist_ok=True)
+        part = f"{entry}.{os.getpid()}.part"
+        with open(part, 'wb') as f:
+            np.save(f, matrix)
+        publish_entry(part, entry, pattern)
+    return np.load(entry, mmap_mode='r')
@@ -0,0 +1,118 @@
+import argparse
+import contextlib
+import os
+from kilobots import load_config
+from recorder import EXTENSIONS, open_recorder
+from metrics import MetricsStream
+from simulation import Simulation
+
+
+class EnsembleSimulation(Simulation):
+
+    """Simulation of independent replicas of one configuration in a single swarm. The replicas share the swarm
+    arrays (R x N bots, tagged with their replica), so every step is one array pass over the whole ensemble,
+    while each replica keeps its own random stream, neighbours and collisions. Every replica therefore evolves
+    exactly as a single run with its seed, and is recorded to its own output.
+    """
+    def __init__(self, config, seeds, kilobots=None) -> None:
+        """Spawn one replica of the configured swarm per seed
+
+        Args:
+            config (dict): Configuration in the layout of Data/config.json
+            seeds (list): Seed of every replica
+            kilobots (SwarmState, optional): Ensemble swarm to simulate. Defaults to one spawned from the
+                configuration.
+        """
+        self.seeds = list(seeds)
+        super().__init__(config, self.seeds, kilobots)
+        self.replica_bots = self.kilobots.replica_bots()
+
+
+    @property
+    def tags(self):
+        """Run name of every replica, as used by sweeps
+        """
+        return [f"{self.name}_seed={seed}" for seed in self.seeds]
+
+
+    def output_paths(self, output_dir="Data/Simulation"):
+        return [os.path.join(output_dir, f"sim_data_{tag}{EXTENSIONS[self.record_format]}") for tag in self.tags]
+
+
+    def metrics_paths(self, output_dir="Data/Simulation"):
+        return [os.path.join(output_dir, f"metrics_{tag}.csv") for tag in self.tags]
+
+
+    def record(self, recorders):
+        """Records every replica's Kilobots for the current frame, each to its own recorder
+
+        Args:
+            recorders (list): Recorder of every replica
+        """
+        kilobots = self.kilobots
+        for replica, (bots, recorder) in enumerate(zip(self.replica_bots, recorders)):
+            aggregates = self.aggregates[replica]
+            recorder.record(self.time_step, kilobots.x[bots], kilobots.y[bots], kilobots.theta[bots],
+                            kilobots.neighbor_count[bots], aggregates.com_x, aggregates.com_y,
+                            kilobots.est_heading[bots], kilobots.heading_error[bots])
+
+
+    def update_metrics(self, streams):
+        """Emits the online metrics of every replica for the current frame
+
+        Args:
+            streams (list): Metrics stream of every replica
+        """
+        for replica, (bots, stream) in enumerate(zip(self.replica_bots, streams)):
+            stream.update(self.time_step, self.aggregates[replica],
+                          self.kilobots.heading_error[bots] if self.pattern else ())
+
+
+def run_ensemble(config, seeds, paths=None, metrics_paths=None):
+    """Runs one replica per seed headless until sim_time, in a single process
+
+    Args:
+        config (dict): Configuration in the layout of Data/config.json
+        seeds (list): Seed of every replica
+        paths (list, optional): Output path of every replica. Defaults to
+            Data/Simulation/sim_data_<NAME>_seed=<SEED> (.csv or .traj).
+        metrics_paths (list, optional): Metrics CSV path of every replica. Defaults to
+            Data/Simulation/metrics_<NAME>_seed=<SEED>.csv.
+
+    Returns:
+        EnsembleSimulation: The finished simulation
+    """
+    simulation = EnsembleSimulation(config, seeds)
+    if not simulation.recording:
+        raise ValueError("Headless runs need a finite sim_time, as an infinite one (interactive running) never ends")
+    paths = paths or simulation.output_paths()
+    metrics_paths = metrics_paths or simulation.metrics_paths()
+
+    with contextlib.ExitStack() as stack:
+        recorders = [stack.enter_context(open_recorder(path, simulation.record_format)) for path in paths]
+        streams = [stack.enter_context(MetricsStream(simulation.kilobots.fps, path if simulation.metrics else None))
+                   for path in metrics_paths]
+
+        simulation.profiler.start()
+        while not simulation.finished:
+            simulation.step(recorders, streams)
+            simulation.profiler.end_frame()
+
+    simulation.profiler.dump(simulation.profile_path)
+    return simulation
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run independent replicas of a simulation in one process")
+    parser.add_argument("--config", default="Data/config.json", help="Path to the simulation configuration")
+    parser.add_argument("--replicas", type=int, default=8, help="Number of replicas")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="Seed of the first replica; replica r uses SEED + r and matches a single run with it")
+    args = parser.parse_args()
+
+    run_ensemble(load_config(args.config), range(args.seed, args.seed + args.replicas))
+
+
+if __name__ == "__main__":
+
+    main()
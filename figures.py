@@ -0,0 +1,255 @@
+import argparse
+import fnmatch
+import functools
+import hashlib
+import inspect
+import json
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import matplotlib
+
+# Figures are only ever written to files, so the non-interactive backend is selected before pyplot is imported
+matplotlib.use("Agg")
+
+import matplotlib.pyplot as plt
+import analysis
+import datasets
+import data_plots_simulation as plots
+import data_plots_video as video
+from analysis import DatasetAnalysis, content_hash
+
+RESULTS_DIR = "Results"
+STATE_FILE = os.path.join("Data", "Cache", "figures.json")
+SHARED_MODULES = (analysis, datasets)   # Modules every figure's statistics and loading go through
+
+
+@functools.lru_cache(maxsize=None)
+def module_source(module):
+    return inspect.getsource(module)
+
+
+def simulation_path(name):
+    return os.path.join("Data", "Simulation", f"sim_data_{name}.csv")
+
+
+class Figure():
+
+    """Figure of Results/ and the input datasets it is drawn from. Each input is loaded (by default as a
+    DatasetAnalysis) and passed to the plotting function, followed by any further arguments.
+    """
+    def __init__(self, output, plot, inputs, *args, grouped=False, load=DatasetAnalysis, default=True,
+                 **kwargs) -> None:
+        """Declare the figure
+
+        Args:
+            output (str): File the plotting function saves into Results/
+            plot (callable): Plotting function
+            inputs (list): Paths of the input datasets
+            *args: Further positional arguments of the plotting function
+            grouped (bool, optional): Pass the loaded inputs as one list rather than one argument each.
+                Defaults to False.
+            load (callable, optional): Loads an input path. Defaults to DatasetAnalysis.
+            default (bool, optional): Build the figure when no figures are named, rather than only on request
+                (e.g. for slow animations). Defaults to True.
+            **kwargs: Keyword arguments of the plotting function
+        """
+        self.name = os.path.splitext(output)[0]
+        self.output = output
+        self.plot = plot
+        self.inputs = list(inputs)
+        self.args = args
+        self.grouped = grouped
+        self.load = load
+        self.default = default
+        self.kwargs = kwargs
+
+
+    @property
+    def code(self):
+        """Hash of the figure's arguments and the source of every module its drawing goes through (the plotting
+        function's and loader's modules, with their helpers, and SHARED_MODULES), so that editing any of them
+        rebuilds it
+        """
+        modules = [inspect.getmodule(self.plot), inspect.getmodule(self.load), *SHARED_MODULES]
+        digest = hashlib.blake2b(digest_size=16)
+        for module in sorted(set(modules), key=lambda module: module.__name__):
+            digest.update(module_source(module).encode())
+        digest.update(repr((self.plot.__name__, self.args, self.kwargs, self.grouped, self.load.__name__)).encode())
+        return digest.hexdigest()
+
+
+    def build(self):
+        loaded = [self.load(path) for path in self.inputs]
+        arguments = [loaded] if self.grouped else loaded
+        self.plot(*arguments, *self.args, **self.kwargs)
+
+
+ALIGN_ANTI = [simulation_path("alignment"), simulation_path("anti-alignment")]
+ANTI_NO = [simulation_path("anti-alignment"), simulation_path("random_no_boundary")]
+TRACKS = [video.x_csv, video.y_csv]
+
+FIGURES = {figure.name: figure for figure in [
+    Figure("RunAndTumble.png", plots.one_bot_path, [simulation_path("one_bot")]),
+    Figure("HeatmapAlignAnti.png", plots.heatmap_align_anti, ALIGN_ANTI),
+    Figure("CoMTwoPlot.png", plots.com_align_anti, ALIGN_ANTI),
+    Figure("OrderTwoPlot.png", plots.vicsek_order_two_plot, ALIGN_ANTI, ["Alignment", "Anti-Alignment"],
+           grouped=True),
+    Figure("ThetaTwoPlot.png", plots.theta_two_plot, ALIGN_ANTI, ["Alignment", "Anti-Alignment"], grouped=True),
+    Figure("OrderOnePlot.png", plots.vicsek_order_one_plot, ALIGN_ANTI, ["Alignment", "Anti-Alignment"],
+           grouped=True),
+    Figure("ThetaOnePlot.png", plots.theta_one_plot, ALIGN_ANTI, ["Alignment", "Anti-Alignment"], grouped=True),
+    Figure("NeighbourAlignment.png", plots.kilobot_neighbor_plot, ALIGN_ANTI[:1], df_name="Alignment",
+           num_bots=5, seed=0),
+    Figure("NeighbourAnti-Alignment.png", plots.kilobot_neighbor_plot, ALIGN_ANTI[1:], df_name="Anti-Alignment",
+           num_bots=5, seed=0),
+    Figure("HeatmapAdjust.png", plots.heatmap_adjust_rates,
+           [simulation_path("adjust_1000"), simulation_path("anti-alignment"), simulation_path("adjust_5000"),
+            simulation_path("adjust_10000")], [1000, 2500, 5000, 10000], grouped=True),
+    Figure("PatternErrors.png", plots.sequencing_error_plots,
+           [simulation_path("triangle_pattern"), simulation_path("intensity_pattern")]),
+    Figure("HeatmapAntiNo.png", plots.heatmap_anti_no, ANTI_NO),
+    Figure("NeighbourNo Alignment.png", plots.kilobot_neighbor_plot, ANTI_NO[1:], df_name="No Alignment",
+           num_bots=3, seed=0),
+    Figure("NeighbourPlotTwo.png", plots.kilobot_two_neighbor_plot, ANTI_NO, ["Anti-Alignment", "No Alignment"],
+           grouped=True),
+    Figure("KilobotVideoTrackPlot.png", video.static_plot, TRACKS, load=video.load_track),
+    Figure("KilobotVideoTrackAnimation.gif", video.animated_plot, TRACKS, load=video.load_track, default=False),
+]}
+
+
+def build_figure(name, usetex=False):
+    """Renders one registered figure, in a worker process
+
+    Args:
+        name (str): Figure name
+        usetex (bool, optional): Typeset text with LaTeX rather than matplotlib's mathtext. Defaults to False.
+
+    Returns:
+        dict: Figure name, status ("done" or "failed", with the error) and elapsed seconds
+    """
+    result = {"name": name}
+    start = time.perf_counter()
+    try:
+        plt.rcParams["text.usetex"] = usetex
+        FIGURES[name].build()
+        result["status"] = "done"
+    except Exception:
+        result["status"] = "failed"
+        result["error"] = traceback.format_exc()
+    finally:
+        plt.close("all")
+    result["elapsed"] = round(time.perf_counter() - start, 3)
+    return result
+
+
+def load_state(path=STATE_FILE):
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def write_state(state, path=STATE_FILE):
+    """Writes the build state atomically, so that it only ever records finished figures
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".part", 'w') as f:
+        json.dump(state, f, indent=4)
+    os.replace(path + ".part", path)
+
+
+def figure_keys(figures, usetex=False):
+    """What every figure was built from: the content hash of each input, its code and the text renderer
+
+    Args:
+        figures (list): Figures
+        usetex (bool, optional): LaTeX text rendering. Defaults to False.
+
+    Returns:
+        dict: Figure name mapped to its key
+    """
+    hashes = {}
+    keys = {}
+    for figure in figures:
+        for path in figure.inputs:
+            if path not in hashes:
+                hashes[path] = content_hash(path) if os.path.exists(path) else None
+        keys[figure.name] = {"inputs": {path: hashes[path] for path in figure.inputs}, "code": figure.code,
+                             "usetex": usetex}
+    return keys
+
+
+def build_figures(patterns=None, workers=None, force=False, usetex=False):
+    """Rebuilds the registered figures whose inputs, code or text renderer changed since they were last built
+    (or whose output is missing), in parallel worker processes
+
+    Args:
+        patterns (iterable, optional): Figure name globs. Defaults to every default figure.
+        workers (int, optional): Number of worker processes. Defaults to the number of cores.
+        force (bool, optional): Rebuild every selected figure. Defaults to False.
+        usetex (bool, optional): Typeset text with LaTeX (slow). Defaults to False.
+
+    Returns:
+        dict: Build result per rebuilt figure
+    """
+    if patterns:
+        figures = [figure for name, figure in FIGURES.items()
+                   if any(fnmatch.fnmatch(name, pattern) for pattern in patterns)]
+    else:
+        figures = [figure for figure in FIGURES.values() if figure.default]
+    keys = figure_keys(figures, usetex)
+    state = load_state()
+
+    missing = {}
+    for figure in figures:
+        absent = [path for path, digest in keys[figure.name]["inputs"].items() if digest is None]
+        if absent:
+            missing[figure.name] = absent
+            print(f"{figure.name} skipped, missing {', '.join(absent)}")
+    pending = [figure.name for figure in figures if figure.name not in missing and
+               (force or state.get(figure.name) != keys[figure.name]
+                or not os.path.exists(os.path.join(RESULTS_DIR, figure.output)))]
+    print(f"{len(figures)} figures, {len(figures) - len(pending) - len(missing)} up to date, {len(pending)} to build")
+
+    results = {}
+    if not pending:
+        return results
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=min(workers or os.cpu_count(), len(pending))) as executor:
+        futures = [executor.submit(build_figure, name, usetex) for name in pending]
+
+        for completed, future in enumerate(as_completed(futures), start=1):
+            result = future.result()
+            results[result["name"]] = result
+            if result["status"] == "done":
+                state[result["name"]] = keys[result["name"]]
+                write_state(state)
+            print(f"[{completed}/{len(pending)}] {result['name']} {result['status']} in {result['elapsed']}s")
+            if result["status"] == "failed":
+                print(result["error"])
+
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rebuild the figures in Results/ whose input datasets changed")
+    parser.add_argument("figures", nargs="*", metavar="GLOB",
+                        help="Figures to consider, e.g. 'Heatmap*' (default: all but the opt-in animation)")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes (default: all cores)")
+    parser.add_argument("--force", action="store_true", help="Rebuild the figures even if their inputs are unchanged")
+    parser.add_argument("--usetex", action="store_true", help="Typeset text with LaTeX (slow, needs a TeX install)")
+    parser.add_argument("--list", action="store_true", help="List the figures and their inputs, then exit")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for name, figure in FIGURES.items():
+            print(f"{name}{'' if figure.default else ' (opt-in)'}: {', '.join(figure.inputs)}")
+        return
+    build_figures(args.figures, args.workers, args.force, args.usetex)
+
+
+if __name__ == "__main__":
+
+    main()
@@ -34,10 +34,22 @@ ENUM_COLOR = {
 }
 
 with open('Data/heading_dict.json', 'r') as f0:
-    HEADINGS_MAP = json.load(f0)
+    HEADINGS_MAP = {int(sequence): heading for sequence, heading in json.load(f0).items()}  # JSON keys are strings
     
-with open('Data/config.json', 'r') as f1:
-    config = json.load(f1)
+def load_config(path='Data/config.json'):
+    """Loads a simulation configuration file
+
+    Args:
+        path (str, optional): Path to the JSON configuration. Defaults to 'Data/config.json'.
+
+    Returns:
+        dict: Configuration with "simulation" and "kilobots" sections
+    """
+    with open(path, 'r') as f1:
+        return json.load(f1)
+
+
+config = load_config()
  
 config_sim = config["simulation"]   
 config_bots = config["kilobots"]
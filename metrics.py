@@ -0,0 +1,98 @@
+import csv
+import math
+import numpy as np
+
+METRIC_COLUMNS = ['TimeStep', 'Time', 'Order', 'MeanNeighbors', 'ZeroNeighbors', 'CoMX', 'CoMY', 'CoMDrift', 'MeanHeadingError']
+
+
+def mean_heading_error(heading_error):
+    """Mean of the heading errors that are not NaN (NaN if there are none)
+    """
+    heading_error = np.asarray(heading_error, dtype=float)
+    valid = ~np.isnan(heading_error)
+    return heading_error[valid].mean() if valid.any() else math.nan
+
+
+class MetricsStream():
+
+    """Online swarm metrics (Vicsek order, neighbour counts, CoM drift and mean heading error) emitted as
+    one row per sample to a small time-series CSV and/or callbacks, using constant memory
+    """
+    def __init__(self, fps, path=None, callbacks=(), resume=None) -> None:
+        """Open the metrics stream
+
+        Args:
+            fps (int): Simulation frames per second, used to convert time steps to milliseconds
+            path (str, optional): Time-series CSV to write. Defaults to None (callbacks only).
+            callbacks (iterable, optional): Functions called with each metrics row (dict). Defaults to ().
+            resume (dict, optional): Stream state from checkpoint() to continue from. Defaults to None.
+        """
+        self.fps = fps
+        self.callbacks = list(callbacks)
+        self.com_start = None if resume is None else resume["com_start"]
+        self.csvfile = None
+        if path is not None and (resume is None or resume["position"] is None):
+            self.csvfile = open(path, 'w', newline='')
+            self.csv_writer = csv.writer(self.csvfile)
+            self.csv_writer.writerow(METRIC_COLUMNS)
+        elif path is not None:
+            self.csvfile = open(path, 'r+', newline='')
+            self.csvfile.truncate(resume["position"])
+            self.csvfile.seek(resume["position"])
+            self.csv_writer = csv.writer(self.csvfile)
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+    def update(self, time_step, aggregates, heading_error=()):
+        """Emits the metrics for one sample
+
+        Args:
+            time_step (int): Simulation frame
+            aggregates (SwarmAggregates): Swarm aggregates of the sampled frame
+            heading_error (array, optional): Per-bot heading estimation errors. Defaults to ().
+
+        Returns:
+            dict: Metrics row keyed by METRIC_COLUMNS
+        """
+        if self.com_start is None:
+            self.com_start = (aggregates.com_x, aggregates.com_y)
+
+        row = {
+            'TimeStep': time_step,
+            'Time': 1000 * time_step / self.fps,
+            'Order': aggregates.order,
+            'MeanNeighbors': aggregates.mean_neighbors,
+            'ZeroNeighbors': aggregates.zero_neighbors,
+            'CoMX': aggregates.com_x,
+            'CoMY': aggregates.com_y,
+            'CoMDrift': math.hypot(aggregates.com_x - self.com_start[0], aggregates.com_y - self.com_start[1]),
+            'MeanHeadingError': mean_heading_error(heading_error),
+        }
+
+        if self.csvfile is not None:
+            self.csv_writer.writerow([row[column] for column in METRIC_COLUMNS])
+        for callback in self.callbacks:
+            callback(row)
+        return row
+
+
+    def checkpoint(self):
+        """Flushes the time series and returns the state needed to continue the stream after a restore
+        """
+        position = None
+        if self.csvfile is not None:
+            self.csvfile.flush()
+            position = self.csvfile.tell()
+        return {"position": position, "com_start": self.com_start}
+
+
+    def close(self):
+        if self.csvfile is not None:
+            self.csvfile.close()
@@ -0,0 +1,116 @@
+import json
+import time
+import numpy as np
+
+PHASES = ("detect", "motion", "aggregates", "sensing", "record", "render", "flip", "idle")
+WINDOW = 2 ** 16                # Frames kept per phase for the percentiles
+OVERLAY_FRAMES = 60             # Frames averaged by the on-screen overlay
+PERCENTILES = (50, 90, 99)
+
+
+def _skip(*args):
+    pass
+
+
+class PhaseProfiler():
+
+    """Per-phase frame timer. Each lap() charges the time since the previous lap to a phase of the current
+    frame and end_frame() stores the frame's phase times in a fixed-size window, so memory stays flat on long
+    runs. When disabled, lap() and end_frame() are no-ops.
+    """
+    def __init__(self, enabled=False, window=WINDOW) -> None:
+        """Create the profiler
+
+        Args:
+            enabled (bool, optional): Time the phases. Defaults to False.
+            window (int, optional): Frames kept per phase for the percentiles. Defaults to WINDOW.
+        """
+        self.enabled = enabled
+        self.frames = 0
+        self.last = time.perf_counter()
+        self.current = dict.fromkeys(PHASES, 0.0)
+        self.times = np.zeros((window, len(PHASES)))
+        self.column = {phase: column for column, phase in enumerate(PHASES)}
+        if not enabled:
+            self.lap = _skip
+            self.end_frame = _skip
+
+
+    def start(self):
+        """Restarts the lap clock, e.g. at the top of the main loop
+        """
+        self.last = time.perf_counter()
+
+
+    def lap(self, phase):
+        """Charges the time since the previous lap to a phase of the current frame
+        """
+        now = time.perf_counter()
+        self.current[phase] += now - self.last
+        self.last = now
+
+
+    def end_frame(self):
+        """Stores the phase times of the finished frame
+        """
+        row = self.times[self.frames % len(self.times)]
+        for phase, elapsed in self.current.items():
+            row[self.column[phase]] = elapsed
+            self.current[phase] = 0.0
+        self.frames += 1
+
+
+    def window(self, frames=None):
+        """Phase times of the most recent frames
+
+        Args:
+            frames (int, optional): Number of frames. Defaults to every frame kept.
+
+        Returns:
+            array: Seconds per frame (rows) and phase (columns), oldest first
+        """
+        kept = min(self.frames, len(self.times))
+        frames = kept if frames is None else min(frames, kept)
+        rows = np.arange(self.frames - frames, self.frames) % len(self.times)
+        return self.times[rows]
+
+
+    def overlay_text(self, frames=OVERLAY_FRAMES):
+        """One line of mean milliseconds per phase over the most recent frames, for the on-screen overlay
+        """
+        times = self.window(frames)
+        if not len(times):
+            return ""
+        means = times.mean(axis=0) * 1e3
+        total = times.sum(axis=1).mean() * 1e3
+        return "  ".join([f"{phase} {mean:.2f}" for phase, mean in zip(PHASES, means)] + [f"| frame {total:.2f} ms"])
+
+
+    def summary(self):
+        """Per-phase statistics over the kept frames
+
+        Returns:
+            dict: Frames profiled and, per phase and for whole frames, the mean, percentiles and max in ms
+        """
+        times = self.window()
+        columns = dict(zip(PHASES, times.T))
+        columns["frame"] = times.sum(axis=1)
+
+        phases = {}
+        for phase, column in columns.items():
+            if not len(column):
+                continue
+            stats = {"mean": column.mean() * 1e3}
+            stats.update({f"p{q}": value * 1e3 for q, value in zip(PERCENTILES, np.percentile(column, PERCENTILES))})
+            stats["max"] = column.max() * 1e3
+            phases[phase] = stats
+        return {"frames": self.frames, "window": len(times), "phases": phases}
+
+
+    def dump(self, path):
+        """Writes the per-phase summary to a JSON file (nothing is written when disabled)
+        """
+        if not self.enabled:
+            return
+        with open(path, 'w') as f:
+            json.dump(self.summary(), f, indent=4)
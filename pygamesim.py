@@ -1,156 +1,168 @@
-import pygame 
+import argparse
 import math
+import os
 import sys
-import csv
-from kilobots import *
+from kilobots import load_config
+from simulation import Simulation, run_headless
 
-SQUARE_LENGTH = 50
 
-def handle_inputs(event):
-    global PAUSED, TUMBLING, DETECTING, radii, ALIGNMENT
-    
+def handle_inputs(event, simulation):
+    global radii, overlay
+    import pygame
+
     if event.key == pygame.K_SPACE:
-        PAUSED = not PAUSED
+        simulation.paused = not simulation.paused
     if event.key == pygame.K_t:
-        TUMBLING = not TUMBLING
+        simulation.tumbling = not simulation.tumbling
     if event.key == pygame.K_d:
-        DETECTING = not DETECTING
+        simulation.detecting = not simulation.detecting
     if event.key == pygame.K_r:
-        radii = not radii 
+        radii = not radii
+    if event.key == pygame.K_p:
+        overlay = not overlay
     if event.key == pygame.K_0:
-        ALIGNMENT = 0 
+        simulation.alignment = 0
     if event.key == pygame.K_1:
-        ALIGNMENT = 1
+        simulation.alignment = 1
     if event.key == pygame.K_2:
-        ALIGNMENT = -1
-        
-        
-if __name__ == "__main__": 
-    
+        simulation.alignment = -1
+
+
+def run_interactive(config, seed=None, checkpoint_path=None, resume=False):
+    """Runs the simulation in a pygame window. Physics steps of 1/physics_rate seconds are decoupled from the
+    display, which refreshes at "render_fps" while the physics runs "time_scale" times faster than real time
+    (or "steps_per_frame" steps per rendered frame)
+
+    Args:
+        config (dict): Configuration in the layout of Data/config.json
+        seed (optional): Seed for the swarm random number generator. Defaults to None.
+        checkpoint_path (str, optional): Checkpoint saved with the C key (and resumed from). Defaults to None.
+        resume (bool, optional): Continue from checkpoint_path if it exists. Defaults to False.
+    """
+    global radii, overlay
+    import pygame
+    from checkpoint import load_checkpoint, save_checkpoint
+    from renderer import Renderer
+    from timestep import FixedTimestep
+
+    if resume and checkpoint_path is not None and os.path.exists(checkpoint_path):
+        simulation = load_checkpoint(checkpoint_path)
+    else:
+        simulation = Simulation(config, seed)
+    kilobots = simulation.kilobots
+    width, height = kilobots.width, kilobots.height
+    config_sim = config["simulation"]
+    render_fps = config_sim.get("render_fps", kilobots.fps)
+
     pygame.init()
-    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    screen = pygame.display.set_mode((width, height))
     pygame.display.set_caption("Kilobot Run and Tumble Simulation")
-    
-    if PATTERN == 1:
-        bg = pygame.image.load("Patterns/pattern_triangles.png")
-    elif PATTERN == 2:
-        bg = pygame.image.load("Patterns/pattern_intensity.png")
-    else:
-        grid_size = 50
 
     clock = pygame.time.Clock()
-    time_step = 0
-    kilobots = []
     added_kilobots = 0
-    com_x, com_y = 0, 0
-    
+
     simulating = True
     radii = False
+    overlay = True
+    profiler = simulation.profiler
 
-    while len(kilobots) < NUM_KILOBOTS:
-        
-        kilobot = Kilobot()
-        
-        if not any((bot.x, bot.y) == (kilobot.x, kilobot.y) for bot in kilobots):
-            kilobots.append(kilobot)
-    
     font = pygame.font.Font(None, 20)
-    
-    csv_file_path = f"Data/Simulation/sim_data_{NAME}.csv"
-    with open(csv_file_path, 'w', newline='') as csvfile:
-        
-        csv_writer = csv.writer(csvfile)
-        csv_writer.writerow(['TimeStep', 'KilobotID', 'X', 'Y', 'Theta', 'Neighbors', 'CoMX', 'CoMY', 'EstimateHeading', 'EstimateError']) 
+    renderer = Renderer(simulation, screen, font)
+    timestep = FixedTimestep(kilobots.frame_step / kilobots.fps, 1 / render_fps, config_sim.get("time_scale", 1.0),
+                             config_sim.get("steps_per_frame"))
+
+    with simulation.open_recorder() as recorder, simulation.open_metrics() as metrics:
 
+        profiler.start()
         while simulating:
-            
-            text = f"SPACE : Pause  T : Tumble  D : Detection  R : Radii [0, 1, 2] : ALIGNMENT ({ALIGNMENT}) Click : Add Kilobot"
 
-            if PATTERN:
-                screen.blit(bg, (0, 0))
-            else:
-                screen.fill(Color.WHITE.value)
-            
-            if SIM_TIME != math.inf:
-                if time_step == milliseconds_to_frames(SIM_TIME):
-                    simulating = False
-            
-            for event in pygame.event.get(): 
+            renderer.draw_static()
+
+            if simulation.finished:
+                break
+
+            for event in pygame.event.get():
                 if event.type == pygame.QUIT:
-                    simulating = False  
+                    simulating = False
                 elif event.type == pygame.MOUSEBUTTONDOWN:
                     mouse_x, mouse_y = pygame.mouse.get_pos()
                     added_kilobots += 1
-                    kilobots.append(Kilobot(click_place=(mouse_x, mouse_y, -math.pi/4)))
+                    kilobots.add(mouse_x, mouse_y, -math.pi/4)
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_c and checkpoint_path is not None:
+                    save_checkpoint(simulation, checkpoint_path, recorder, metrics)
                 elif event.type == pygame.KEYDOWN:
-                    handle_inputs(event)                                         
-                
-            text_surface = font.render(text, True, Color.BLACK.value)
-            screen.blit(text_surface, (0, 0))
-                    
-            if not PATTERN:
-                for x in range(0, WIDTH, grid_size):
-                    pygame.draw.line(screen, Color.GREY.value, (x, 0), (x, HEIGHT), 1)
-
-                for y in range(0, HEIGHT, grid_size):
-                    pygame.draw.line(screen, Color.GREY.value, (0, y), (WIDTH, y), 1)
-
-            if kilobots:
-                for kilobot_id, kilobot in enumerate(kilobots):
-                    
-                    if not PAUSED:
-                        
-                        if time_step % milliseconds_to_frames(100) == 0 and SIM_TIME != math.inf:
-                            # Record kilobot information
-                            data = [time_step, kilobot_id, int(kilobot.x), int(kilobot.y),
-                                    round(kilobot.theta, 2), int(kilobot.neighbor_count),
-                                    int(com_x), int(com_y), round(kilobot.est_heading, 2),
-                                    round(kilobot.heading_error, 2)]
-                            csv_writer.writerow(data)                   
-                        
-                        if DETECTING:
-                            kilobot.neighbor_detect(kilobots, ALIGNMENT)  
-                            
-                        kilobot.events()
-                        
-                        com_x, com_y = kilobot.centre_of_mass(kilobots)
-                        
-                        if PATTERN == 1:
-                            bg_color = bg.get_at((int(kilobot.x), int(kilobot.y)))
-                            old_sequence = kilobot.sequence.copy()
-                            kilobot.color_sequence(bg_color)
-                            
-                            if (kilobot.sequence != old_sequence):
-                                kilobot.estimate_heading()
-                                
-                        elif PATTERN == 2:
-                            prev_reading = 0
-                            if kilobot.intensity_read:
-                                prev_reading = kilobot.intensity_read
-                                prev_time_step_x = kilobot.intense_read_time_x
-                                prev_time_step_y = kilobot.intense_read_time_y
-                            
-                            kilobot.intensity_read = bg.get_at((int(kilobot.x), int(kilobot.y)))
-                            kilobot.intense_time_read_x = time_step
-                            kilobot.intense_time_read_y = time_step
-                            
-                            if prev_reading:
-                                kilobot.intensity_heading(prev_reading, prev_time_step_x, prev_time_step_y, SQUARE_LENGTH) 
-                            
-                        if TUMBLING:
-                            kilobot.tumble()           
-                    
-                    pygame.draw.circle(screen, kilobot.status, (kilobot.x, kilobot.y), RADIUS)
-                    
-                    if radii:
-                        pygame.draw.circle(screen, kilobot.detection, (kilobot.x, kilobot.y), DETECT_RADIUS, 2)
-            
+                    handle_inputs(event, simulation)
+
+            renderer.draw_stats(simulation.record_frames)
+            renderer.draw_text(f"Steps/s : {timestep.rate:.0f}  Speed : {timestep.speed:.2f}x real time", 2)
+            if profiler.enabled and overlay:
+                renderer.draw_text(profiler.overlay_text(), 3)
+            profiler.lap("render")
+
+            if simulation.paused:
+                timestep.reset()
+            else:
+                for _ in timestep.ticks():
+                    simulation.step(recorder, metrics)
+                    if simulation.finished:
+                        break
+
+            renderer.draw_bots(radii)
+            profiler.lap("render")
+
             pygame.display.flip()
-            time_step += 1
-            clock.tick(FPS)
-            
+            profiler.lap("flip")
+            clock.tick(render_fps)
+            profiler.lap("idle")
+            profiler.end_frame()
+
+    profiler.dump(simulation.profile_path)
     pygame.quit()
-    
-    
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kilobot Run and Tumble Simulation")
+    parser.add_argument("--config", default="Data/config.json", help="Path to the simulation configuration")
+    parser.add_argument("--headless", action="store_true",
+                        help="Run without a display or frame-rate cap (pygame is not imported)")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for the swarm random number generator")
+    parser.add_argument("--checkpoint", default=None,
+                        help="Checkpoint file, saved at the end (headless) or with the C key (interactive)")
+    parser.add_argument("--checkpoint-every", type=float, default=None, metavar="MS",
+                        help="Also save the checkpoint every MS milliseconds of simulated time (headless)")
+    parser.add_argument("--resume", action="store_true", help="Continue from the checkpoint if it exists")
+    parser.add_argument("--profile", action="store_true",
+                        help="Time the frame phases, show them on screen and write profile_<NAME>.json at exit")
+    parser.add_argument("--speed", type=float, default=None,
+                        help="Simulated seconds per real second, 'inf' for as fast as possible (interactive)")
+    parser.add_argument("--render-fps", type=int, default=None, help="Display refresh rate (interactive)")
+    parser.add_argument("--steps-per-frame", type=int, default=None, metavar="K",
+                        help="Take K physics steps per rendered frame, i.e. render every K-th step (interactive)")
+    parser.add_argument("--fork", default=None, metavar="CHECKPOINT",
+                        help="Start from a checkpoint with this configuration and seed instead of spawning (headless)")
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    if args.profile:
+        config["simulation"]["profile"] = True
+    if args.speed is not None:
+        config["simulation"]["time_scale"] = args.speed
+    if args.render_fps is not None:
+        config["simulation"]["render_fps"] = args.render_fps
+    if args.steps_per_frame is not None:
+        config["simulation"]["steps_per_frame"] = args.steps_per_frame
+    if args.headless:
+        checkpoint_frames = None
+        if args.checkpoint_every:
+            checkpoint_frames = max(int(args.checkpoint_every / 1000 * config["simulation"]["fps"]), 1)
+        run_headless(config, args.seed, checkpoint_path=args.checkpoint, checkpoint_frames=checkpoint_frames,
+                     resume=args.resume, fork=args.fork)
+    else:
+        run_interactive(config, args.seed, args.checkpoint, args.resume)
+
+
+if __name__ == "__main__":
+
+    main()
+
     sys.exit()
-    
\ No newline at end of file
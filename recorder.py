@@ -0,0 +1,284 @@
+import csv
+import json
+import os
+import numpy as np
+
+COLUMNS = {
+    'TimeStep': np.int32,
+    'KilobotID': np.int32,
+    'X': np.int32,
+    'Y': np.int32,
+    'Theta': np.float32,
+    'Neighbors': np.int16,
+    'CoMX': np.int32,
+    'CoMY': np.int32,
+    'EstimateHeading': np.float32,
+    'EstimateError': np.float32,
+}
+CSV_HEADER = list(COLUMNS)
+ROUNDED = ('Theta', 'EstimateHeading', 'EstimateError')        # Columns written to CSV rounded to 2 decimals
+CHUNK_ROWS = 2 ** 16                                           # Rows buffered in memory before each flush
+EXTENSIONS = {"csv": ".csv", "npy": ".traj"}
+
+
+def sample_columns(time_step, x, y, theta, neighbors, com_x, com_y, est_heading, heading_error, typed=True):
+    """Builds one recorded sample (a row per Kilobot) as typed columns
+
+    Args:
+        time_step (int): Simulation frame
+        x (array): X co-ordinates
+        y (array): Y co-ordinates
+        theta (array): Headings
+        neighbors (array): Neighbour counts
+        com_x (float): Swarm centre of mass X co-ordinate
+        com_y (float): Swarm centre of mass Y co-ordinate
+        est_heading (array): Estimated headings
+        heading_error (array): Heading estimation errors
+        typed (bool, optional): Store angles as float32 rather than float64. Defaults to True.
+
+    Returns:
+        dict: Column name mapped to an array with one entry per Kilobot
+    """
+    num_bots = len(x)
+    angle = COLUMNS['Theta'] if typed else float
+    return {
+        'TimeStep': np.full(num_bots, time_step, dtype=COLUMNS['TimeStep']),
+        'KilobotID': np.arange(num_bots, dtype=COLUMNS['KilobotID']),
+        'X': np.trunc(x).astype(COLUMNS['X']),
+        'Y': np.trunc(y).astype(COLUMNS['Y']),
+        'Theta': np.asarray(theta, dtype=angle),
+        'Neighbors': np.asarray(neighbors, dtype=COLUMNS['Neighbors']),
+        'CoMX': np.full(num_bots, int(com_x), dtype=COLUMNS['CoMX']),
+        'CoMY': np.full(num_bots, int(com_y), dtype=COLUMNS['CoMY']),
+        'EstimateHeading': np.asarray(est_heading, dtype=angle),
+        'EstimateError': np.asarray(heading_error, dtype=angle),
+    }
+
+
+def csv_rows(columns):
+    """Formats typed columns as rows in the legacy CSV layout (ints truncated, angles rounded to 2 decimals)
+    """
+    values = [np.round(columns[name].astype(float), 2) if name in ROUNDED else columns[name]
+              for name in CSV_HEADER]
+    return zip(*(value.tolist() for value in values))
+
+
+class CsvRecorder():
+
+    """Recorder writing samples as rows of a sim_data_<NAME>.csv file
+    """
+    def __init__(self, path, resume=None) -> None:
+        """Open the CSV file and write its header, or continue a checkpointed recording
+
+        Args:
+            path (str): CSV path
+            resume (dict, optional): Recorder state from checkpoint(). Defaults to None (start a new file).
+        """
+        self.path = path
+        if resume is None:
+            self.csvfile = open(path, 'w', newline='')
+            self.csv_writer = csv.writer(self.csvfile)
+            self.csv_writer.writerow(CSV_HEADER)
+        else:
+            # Rows written after the checkpoint are dropped, as the resumed simulation writes them again
+            self.csvfile = open(path, 'r+', newline='')
+            self.csvfile.truncate(resume["position"])
+            self.csvfile.seek(resume["position"])
+            self.csv_writer = csv.writer(self.csvfile)
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+    def record(self, *sample):
+        """Writes one sample, see sample_columns for the arguments
+        """
+        self.csv_writer.writerows(csv_rows(sample_columns(*sample, typed=False)))
+
+
+    def checkpoint(self):
+        """Flushes the file and returns the state needed to continue it after a restore
+        """
+        self.csvfile.flush()
+        return {"position": self.csvfile.tell()}
+
+
+    def close(self):
+        self.csvfile.close()
+
+
+class TrajectoryRecorder():
+
+    """Recorder buffering samples into typed NumPy columns and flushing them in chunks to one
+    memory-mappable .npy file per column inside a <path>.traj directory
+    """
+    def __init__(self, path, chunk_rows=CHUNK_ROWS, resume=None) -> None:
+        """Create the trajectory directory and an empty .npy file per column, or continue a checkpointed
+        recording
+
+        Args:
+            path (str): Trajectory directory
+            chunk_rows (int, optional): Rows buffered in memory before each flush. Defaults to CHUNK_ROWS.
+            resume (dict, optional): Recorder state from checkpoint(). Defaults to None (start new columns).
+        """
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.rows = 0 if resume is None else resume["rows"]
+        self.buffered = 0
+        self.buffers = {name: np.empty(chunk_rows, dtype=dtype) for name, dtype in COLUMNS.items()}
+        self.files = {name: open(os.path.join(path, f"{name}.npy"), 'w+b' if resume is None else 'r+b')
+                      for name in COLUMNS}
+        for name, f in self.files.items():
+            if resume is not None:
+                # Rows flushed after the checkpoint are dropped, as the resumed simulation writes them again
+                np.lib.format.read_magic(f)
+                np.lib.format.read_array_header_1_0(f)
+                f.truncate(f.tell() + self.rows * np.dtype(COLUMNS[name]).itemsize)
+            self.write_header(name)
+        with open(os.path.join(path, "meta.json"), 'w') as f:
+            json.dump({"columns": {name: np.dtype(dtype).str for name, dtype in COLUMNS.items()}}, f, indent=4)
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+    def write_header(self, name):
+        """(Re)writes a column's .npy header for the rows flushed so far; numpy pads the header so its size
+        does not change as the row count grows
+        """
+        f = self.files[name]
+        f.seek(0)
+        header = {'descr': np.lib.format.dtype_to_descr(np.dtype(COLUMNS[name])), 'fortran_order': False, 'shape': (self.rows,)}
+        np.lib.format.write_array_header_1_0(f, header)
+        f.seek(0, os.SEEK_END)
+
+
+    def record(self, *sample):
+        """Buffers one sample, see sample_columns for the arguments
+        """
+        columns = sample_columns(*sample)
+        num_rows = len(columns['TimeStep'])
+        start = 0
+
+        while start < num_rows:
+            count = min(num_rows - start, len(self.buffers['TimeStep']) - self.buffered)
+            for name, column in columns.items():
+                self.buffers[name][self.buffered:self.buffered + count] = column[start:start + count]
+            self.buffered += count
+            start += count
+            if self.buffered == len(self.buffers['TimeStep']):
+                self.flush()
+
+
+    def flush(self):
+        """Appends the buffered rows to the column files and updates their headers
+        """
+        if not self.buffered:
+            return
+        for name, f in self.files.items():
+            f.write(self.buffers[name][:self.buffered].tobytes())
+        self.rows += self.buffered
+        self.buffered = 0
+        for name, f in self.files.items():
+            self.write_header(name)
+            f.flush()
+
+
+    def checkpoint(self):
+        """Flushes the buffered rows and returns the state needed to continue the columns after a restore
+        """
+        self.flush()
+        return {"rows": self.rows}
+
+
+    def close(self):
+        self.flush()
+        for f in self.files.values():
+            f.close()
+
+
+def open_recorder(path, record_format="csv", resume=None):
+    """Opens a recorder for the given output format
+
+    Args:
+        path (str): Output path (.csv file or .traj directory)
+        record_format (str, optional): "csv" or "npy". Defaults to "csv".
+        resume (dict, optional): Recorder state from checkpoint() to continue from. Defaults to None.
+
+    Returns:
+        CsvRecorder or TrajectoryRecorder: Recorder accepting samples via record()
+    """
+    if record_format == "csv":
+        return CsvRecorder(path, resume)
+    elif record_format == "npy":
+        return TrajectoryRecorder(path, resume=resume)
+    raise ValueError(f"Unknown record format '{record_format}', expected one of {tuple(EXTENSIONS)}")
+
+
+def load_trajectory(path):
+    """Memory-maps the columns of a recorded trajectory
+
+    Args:
+        path (str): Trajectory directory
+
+    Returns:
+        dict: Column name mapped to a read-only memory-mapped array
+    """
+    return {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r') for name in COLUMNS}
+
+
+def load_dataframe(path):
+    """Loads a recording (.csv file or .traj directory) as a pandas DataFrame
+
+    Args:
+        path (str): Recording path
+
+    Returns:
+        DataFrame: One row per Kilobot per recorded sample
+    """
+    import pandas as pd
+
+    if os.path.isdir(path):
+        return pd.DataFrame({name: np.asarray(column) for name, column in load_trajectory(path).items()})
+    return pd.read_csv(path)
+
+
+def export_csv(path, csv_path, chunk_rows=CHUNK_ROWS):
+    """Exports a recorded trajectory to the legacy CSV layout
+
+    Args:
+        path (str): Trajectory directory
+        csv_path (str): Output CSV path
+        chunk_rows (int, optional): Rows formatted at a time. Defaults to CHUNK_ROWS.
+    """
+    columns = load_trajectory(path)
+    num_rows = len(columns['TimeStep'])
+
+    with open(csv_path, 'w', newline='') as csvfile:
+        csv_writer = csv.writer(csvfile)
+        csv_writer.writerow(CSV_HEADER)
+        for start in range(0, num_rows, chunk_rows):
+            chunk = {name: np.asarray(column[start:start + chunk_rows]) for name, column in columns.items()}
+            csv_writer.writerows(csv_rows(chunk))
+
+
+if __name__ == "__main__":
+
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export a recorded .traj trajectory to the legacy CSV layout")
+    parser.add_argument("trajectory", help="Trajectory directory")
+    parser.add_argument("csv", help="Output CSV path")
+    args = parser.parse_args()
+
+    export_csv(args.trajectory, args.csv)
@@ -0,0 +1,122 @@
+import math
+import pygame
+from kilobots import Color
+from sensing import PATTERN_FILES
+from swarm import STATUS_COLORS, DETECTION_COLORS
+
+GRID_SIZE = 50
+COLOR_KEY = (255, 0, 254)              # Transparent sprite colour, unused by the Kilobot and pattern colours
+HELP_TEXT = ("SPACE : Pause  T : Tumble  D : Detection  R : Radii [0, 1, 2] : ALIGNMENT ({alignment}) "
+             "Click : Add Kilobot  C : Checkpoint  P : Profile")
+
+
+def circle_sprite(color, radius, width=0):
+    """Pre-renders a circle on a run-length encoded colour-keyed surface, which blits much faster than per-pixel
+    alpha for mostly transparent sprites such as radius rings
+
+    Args:
+        color (tuple): RGBA colour
+        radius (float): Circle radius
+        width (int, optional): Outline width (0 fills the circle). Defaults to 0.
+
+    Returns:
+        tuple: Sprite surface and the offset from the circle centre to its top-left corner
+    """
+    half = math.ceil(radius) + 1
+    sprite = pygame.Surface((2 * half, 2 * half))
+    sprite.fill(COLOR_KEY)
+    pygame.draw.circle(sprite, color, (half, half), radius, width)
+    sprite.set_colorkey(COLOR_KEY, pygame.RLEACCEL)
+    return sprite.convert(), half
+
+
+class Renderer():
+
+    """Draws the simulation from a pre-composited static layer (pattern or grid plus help text, rebuilt only
+    when the alignment mode changes) and cached bot sprites blitted in one batch straight from the swarm arrays
+    """
+    def __init__(self, simulation, screen, font) -> None:
+        """Pre-render the static layer and sprites
+
+        Args:
+            simulation (Simulation): Simulation to draw
+            screen (Surface): Display surface
+            font (Font): Font of the text lines
+        """
+        self.simulation = simulation
+        self.screen = screen
+        self.font = font
+        self.line_height = font.get_linesize()
+        self.static = None
+        self.static_alignment = None
+        self.stats_surface = None
+        self.stats_frame = None
+
+        kilobots = simulation.kilobots
+        self.background = pygame.Surface(screen.get_size()).convert()
+        if simulation.pattern:
+            self.background.blit(pygame.image.load(PATTERN_FILES[simulation.pattern]).convert(), (0, 0))
+        else:
+            width, height = screen.get_size()
+            self.background.fill(Color.WHITE.value)
+            for x in range(0, width, GRID_SIZE):
+                pygame.draw.line(self.background, Color.GREY.value, (x, 0), (x, height), 1)
+            for y in range(0, height, GRID_SIZE):
+                pygame.draw.line(self.background, Color.GREY.value, (0, y), (width, y), 1)
+
+        self.bot_sprites, offsets = zip(*[circle_sprite(color, kilobots.radius) for color in STATUS_COLORS])
+        self.bot_offset = offsets[0]
+        self.radius_sprites, offsets = zip(*[circle_sprite(color, kilobots.detect_radius, 2)
+                                             for color in DETECTION_COLORS])
+        self.radius_offset = offsets[0]
+
+
+    def draw_static(self):
+        """Blits the static layer, re-compositing it if the alignment mode changed
+        """
+        alignment = self.simulation.alignment
+        if self.static is None or alignment != self.static_alignment:
+            self.static = self.background.copy()
+            text_surface = self.font.render(HELP_TEXT.format(alignment=alignment), True, Color.BLACK.value)
+            self.static.blit(text_surface, (0, 0))
+            self.static_alignment = alignment
+        self.screen.blit(self.static, (0, 0))
+
+
+    def draw_stats(self, refresh_frames=1):
+        """Draws the swarm statistics line under the help text, re-rendering it every refresh_frames frames
+        """
+        time_step = self.simulation.time_step
+        if self.stats_surface is None or time_step - self.stats_frame >= refresh_frames or time_step < self.stats_frame:
+            aggregates = self.simulation.aggregates
+            stats = (f"Kilobots : {aggregates.num_bots}  CoM : ({aggregates.com_x:.0f}, {aggregates.com_y:.0f})  "
+                     f"Order : {aggregates.order:.3f}  Mean Neighbours : {aggregates.mean_neighbors:.2f}")
+            self.stats_surface = self.font.render(stats, True, Color.BLACK.value)
+            self.stats_frame = time_step
+        self.screen.blit(self.stats_surface, (0, self.line_height))
+
+
+    def draw_text(self, text, line):
+        """Draws a line of text at a text line index (0 is the help text)
+        """
+        if text:
+            self.screen.blit(self.font.render(text, True, Color.BLACK.value), (0, line * self.line_height))
+
+
+    def draw_bots(self, radii=False):
+        """Blits every bot (and optionally its detection radius) in one batch from the swarm arrays
+
+        Args:
+            radii (bool, optional): Also draw the detection radii. Defaults to False.
+        """
+        kilobots = self.simulation.kilobots
+        # Truncate like pygame.draw.circle does with float centres
+        x, y = kilobots.x.astype(int), kilobots.y.astype(int)
+        batch = list(zip(map(self.bot_sprites.__getitem__, kilobots.state.tolist()),
+                         zip((x - self.bot_offset).tolist(), (y - self.bot_offset).tolist())))
+
+        if radii:
+            batch += zip(map(self.radius_sprites.__getitem__, kilobots.detected.tolist()),
+                         zip((x - self.radius_offset).tolist(), (y - self.radius_offset).tolist()))
+
+        self.screen.blits(batch, doreturn=False)
@@ -0,0 +1,95 @@
+import numpy as np
+
+DETECT, PAUSE_END, TUMBLE = "detect", "pause_end", "tumble"
+KINDS = (DETECT, PAUSE_END, TUMBLE)
+
+
+class EventScheduler():
+
+    """Calendar queue of per-bot timer events (next detection, end of tumble/adjust pause, next tumble)
+    bucketed by the frame they are due on, so that each step only touches the bots with due events.
+
+    Rescheduling a bot does not remove its old entry; the owner keeps the authoritative due frame per bot
+    and discards stale entries when they are popped.
+    """
+    def __init__(self) -> None:
+        self.calendar = {}
+
+
+    def __len__(self):
+        return sum(len(bots) for buckets in self.calendar.values() for bots in buckets)
+
+
+    def schedule(self, kind, frames, bots):
+        """Schedules events for a batch of bots
+
+        Args:
+            kind (str): Event kind (DETECT, PAUSE_END or TUMBLE)
+            frames (int or array): Frame (or clock value) each event is due on
+            bots (array): Kilobot indices
+        """
+        bots = np.asarray(bots, dtype=np.int64)
+        if not len(bots):
+            return
+        frames = np.broadcast_to(np.asarray(frames, dtype=np.int64), bots.shape)
+
+        if np.all(frames == frames[0]):
+            self.calendar.setdefault((kind, int(frames[0])), []).append(bots.copy())
+            return
+
+        order = np.argsort(frames, kind="stable")
+        frames, bots = frames[order], bots[order]
+        starts = np.flatnonzero(np.diff(frames, prepend=frames[0] - 1))
+        for start, end in zip(starts, np.append(starts[1:], len(frames))):
+            self.calendar.setdefault((kind, int(frames[start])), []).append(bots[start:end])
+
+
+    def pop(self, kind, frame):
+        """Removes and returns the bots with events of a kind due on a frame
+
+        Args:
+            kind (str): Event kind
+            frame (int): Frame (or clock value)
+
+        Returns:
+            array: Unique Kilobot indices, possibly including stale entries
+        """
+        buckets = self.calendar.pop((kind, frame), None)
+        if buckets is None:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(buckets))
+
+
+    def clear(self, kind):
+        """Drops every pending event of a kind
+        """
+        for key in [key for key in self.calendar if key[0] == kind]:
+            del self.calendar[key]
+
+
+    def get_state(self):
+        """Flattens the calendar into arrays, for checkpoints
+
+        Returns:
+            dict: Event kind, due frame and Kilobot index of every pending (possibly stale) event
+        """
+        kinds, frames, bots = [], [], []
+        for (kind, frame), buckets in self.calendar.items():
+            for bucket in buckets:
+                kinds.append(np.full(len(bucket), KINDS.index(kind), dtype=np.int8))
+                frames.append(np.full(len(bucket), frame, dtype=np.int64))
+                bots.append(bucket)
+        return {
+            "kinds": np.concatenate(kinds) if kinds else np.empty(0, dtype=np.int8),
+            "frames": np.concatenate(frames) if frames else np.empty(0, dtype=np.int64),
+            "bots": np.concatenate(bots) if bots else np.empty(0, dtype=np.int64),
+        }
+
+
+    def set_state(self, state):
+        """Replaces the calendar with one flattened by get_state
+        """
+        self.calendar = {}
+        for code, kind in enumerate(KINDS):
+            selected = state["kinds"] == code
+            self.schedule(kind, state["frames"][selected], state["bots"][selected])
@@ -0,0 +1,172 @@
+import math
+import numpy as np
+from kilobots import Color, ENUM_COLOR, HEADINGS_MAP
+
+PATTERN_FILES = {
+    1: "Patterns/pattern_triangles.png",
+    2: "Patterns/pattern_intensity.png",
+}
+NO_READING = -1                         # Floor reading of a bot outside the pattern
+COLOR_CODES = {color.value: ENUM_COLOR[color.name] for color in Color}
+SEQUENCE_LENGTH = 3
+HEADING_SECTORS = 12                    # Headings in HEADINGS_MAP are indices of 30 degree sectors
+# Colour transitions read as moving in the positive x direction over the intensity pattern
+FORWARD_TRANSITIONS = ((ENUM_COLOR["RED"], ENUM_COLOR["GREEN"]), (ENUM_COLOR["GREEN"], ENUM_COLOR["WHITE"]),
+                       (ENUM_COLOR["WHITE"], ENUM_COLOR["RED"]))
+
+
+def heading_lut():
+    """Dense lookup table from a colour sequence number (100 * first + 10 * second + third code) to its
+    heading sector in HEADINGS_MAP, -1 where the sequence has no heading
+
+    Returns:
+        array: Heading sector per sequence number (1000 entries)
+    """
+    lut = np.full(10 ** SEQUENCE_LENGTH, -1, dtype=np.int8)
+    for sequence, heading in HEADINGS_MAP.items():
+        lut[sequence] = heading
+    return lut
+
+
+HEADING_LUT = heading_lut()
+FORWARD_LUT = np.zeros((len(ENUM_COLOR), len(ENUM_COLOR)), dtype=bool)
+FORWARD_LUT[tuple(np.transpose(FORWARD_TRANSITIONS))] = True
+
+
+def load_pattern(pattern):
+    """Loads a background pattern as an RGBA pixel array indexed [y, x]
+
+    Args:
+        pattern (int): Background pattern (1: triangular, 2: intensity)
+
+    Returns:
+        array: RGBA pixels (height, width, 4)
+    """
+    try:
+        from PIL import Image
+    except ImportError:
+        raise ImportError(f"Pattern {pattern} is sensed from {PATTERN_FILES[pattern]}, which needs PIL (pip install "
+                          f"pillow); set \"pattern\": 0 to run without a floor pattern") from None
+
+    with Image.open(PATTERN_FILES[pattern]) as image:
+        return np.asarray(image.convert("RGBA"))
+
+
+def intensity_class(reading):
+    """ENUM_COLOR code of the colour an intensity reading is classified as (see Kilobot.evaluate_color)
+
+    Args:
+        reading (tuple): RGBA colour
+
+    Returns:
+        int: ENUM_COLOR code of BLUE, YELLOW or WHITE
+    """
+    R, G, B, _ = reading
+    if R == 0 and G == 0:
+        return ENUM_COLOR["BLUE"]
+    elif B == 0:
+        return ENUM_COLOR["YELLOW"]
+    return ENUM_COLOR["WHITE"]
+
+
+class FloorMap():
+
+    """Background pattern held as a map of palette indices, so that the floor sensor of the whole swarm is a
+    single gather and colour classes are looked up per palette entry instead of per reading
+    """
+    def __init__(self, pixels) -> None:
+        """Build the palette and colour-class maps of a pattern
+
+        Args:
+            pixels (array): RGBA pixels (height, width, 4) indexed [y, x]
+        """
+        height, width, channels = pixels.shape
+        palette, index = np.unique(pixels.reshape(-1, channels), axis=0, return_inverse=True)
+
+        self.height, self.width = height, width
+        self.index = index.reshape(height, width).astype(np.int32)
+        self.palette = [tuple(int(channel) for channel in color) for color in palette]
+        self.color_classes = np.array([COLOR_CODES.get(color, NO_READING) for color in self.palette], dtype=np.int8)
+        self.intensity_classes = np.array([intensity_class(color) for color in self.palette], dtype=np.int8)
+        self.intensity = palette.astype(np.int64).sum(axis=1)
+
+
+    @classmethod
+    def from_pattern(cls, pattern):
+        return cls(load_pattern(pattern))
+
+
+    def read(self, x, y):
+        """Reads the palette index underneath every bot
+
+        Args:
+            x (array): X co-ordinates
+            y (array): Y co-ordinates
+
+        Returns:
+            array: Palette index per bot (NO_READING outside the pattern)
+        """
+        x, y = np.trunc(x), np.trunc(y)
+        inside = (x >= 0) & (x < self.width) & (y >= 0) & (y < self.height)
+        readings = np.full(len(x), NO_READING, dtype=np.int32)
+        readings[inside] = self.index[y[inside].astype(np.int64), x[inside].astype(np.int64)]
+        return readings
+
+
+def heading_errors(theta, est_heading):
+    """Absolute angular difference between headings and their estimates (NaN where there is no estimate)
+    """
+    return np.abs((theta - est_heading + math.pi) % (2 * math.pi) - math.pi)
+
+
+def update_color_sequences(swarm, bots, colors):
+    """Appends a newly detected colour to the last three colour codes of each bot and decodes the completed
+    sequences into heading estimates through HEADING_LUT
+
+    Args:
+        swarm (SwarmState): Swarm holding the colour sequences and estimates
+        bots (array): Indices of the bots that detected a new colour
+        colors (array): ENUM_COLOR code of each new colour
+    """
+    sequence = swarm.color_sequence
+    sequence[bots] = np.column_stack((sequence[bots, 1:], colors))
+
+    complete = bots[sequence[bots, 0] >= 0]
+    codes = sequence[complete].astype(np.int64)
+    heading = HEADING_LUT[100 * codes[:, 0] + 10 * codes[:, 1] + codes[:, 2]]
+
+    found = heading >= 0
+    estimated = complete[found]
+    swarm.est_heading[estimated] = heading[found] * 2 * math.pi / HEADING_SECTORS
+    swarm.heading_error[estimated] = heading_errors(swarm.theta[estimated], swarm.est_heading[estimated])
+
+
+def update_intensity_headings(swarm, bots, previous, readings, floor, time_step, square_length):
+    """Updates the velocity estimates of bots whose intensity pattern reading changed: crossing into another
+    colour class gives the x velocity, a change of intensity within a class gives the y velocity. As in
+    Kilobot.intensity_heading, crossing times are measured from the start of the simulation.
+
+    Args:
+        swarm (SwarmState): Swarm holding the velocity and heading estimates
+        bots (array): Indices of the bots with a changed reading
+        previous (array): Previous palette index of each bot
+        readings (array): Current palette index of each bot
+        floor (FloorMap): Intensity pattern
+        time_step (int): Simulation frame
+        square_length (float): Side of a pattern square
+    """
+    if not len(bots):
+        return
+    velocity = square_length / swarm.frames_to_milliseconds(time_step)
+    previous_class, current_class = floor.intensity_classes[previous], floor.intensity_classes[readings]
+
+    crossed = previous_class != current_class
+    forward = FORWARD_LUT[previous_class[crossed], current_class[crossed]]
+    swarm.x_vel[bots[crossed]] = np.where(forward, velocity, -velocity)
+    brighter = floor.intensity[readings[~crossed]] > floor.intensity[previous[~crossed]]
+    swarm.y_vel[bots[~crossed]] = np.where(brighter, -velocity, velocity)
+
+    x_vel, y_vel = swarm.x_vel[bots], swarm.y_vel[bots]
+    heading = np.arctan2(y_vel, x_vel)
+    heading = np.where(heading < 0, heading + 2 * math.pi, heading)
+    swarm.est_heading[bots] = np.where((x_vel == 0) & (y_vel == 0), math.nan, heading)
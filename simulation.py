@@ -0,0 +1,218 @@
+import math
+import os
+import numpy as np
+from swarm import SwarmState
+from recorder import EXTENSIONS, open_recorder
+from metrics import MetricsStream
+from profiling import PhaseProfiler
+from sensing import FloorMap, heading_errors, update_color_sequences, update_intensity_headings
+
+SQUARE_LENGTH = 50
+
+
+class Simulation():
+
+    """Simulation loop shared by the interactive (pygame) and headless front ends
+    """
+    def __init__(self, config, seed=None, kilobots=None) -> None:
+        """Initialise the swarm, toggles and background pattern from a configuration
+
+        Args:
+            config (dict): Configuration in the layout of Data/config.json
+            seed (optional): Seed for the swarm random number generator. Defaults to None.
+            kilobots (SwarmState, optional): Swarm to simulate, e.g. restored from a checkpoint. Defaults to a
+                swarm spawned from the configuration.
+        """
+        config_sim = config["simulation"]
+
+        self.config = config
+        self.kilobots = SwarmState(config=config, seed=seed) if kilobots is None else kilobots
+        self.sim_time = config_sim["sim_time"]
+        self.paused = config_sim["paused"]
+        self.tumbling = config_sim["tumbling"]
+        self.detecting = config_sim["detecting"]
+        self.alignment = config_sim["alignment"]
+        self.pattern = config_sim["pattern"]
+        self.name = config_sim["name"]
+        self.record_format = config_sim.get("record_format", "csv")
+        self.metrics = config_sim.get("metrics", False)
+        self.floor = FloorMap.from_pattern(self.pattern) if self.pattern else None
+
+        self.time_step = 0
+        self.aggregates = self.kilobots.aggregate()
+        self.record_frames = self.kilobots.milliseconds_to_frames(100)
+        self.resume = {}                # Recorder and metrics states to continue from after a restore
+        self.profiler = PhaseProfiler(config_sim.get("profile", False))
+        self.kilobots.profiler = self.profiler
+
+
+    @property
+    def recording(self):
+        return self.sim_time != math.inf
+
+
+    @property
+    def finished(self):
+        return self.recording and self.time_step > self.kilobots.milliseconds_to_frames(self.sim_time)
+
+
+    @property
+    def output_path(self):
+        return f"Data/Simulation/sim_data_{self.name}{EXTENSIONS[self.record_format]}"
+
+
+    @property
+    def metrics_path(self):
+        return f"Data/Simulation/metrics_{self.name}.csv"
+
+
+    @property
+    def profile_path(self):
+        return f"Data/Simulation/profile_{self.name}.json"
+
+
+    def open_recorder(self, path=None):
+        return open_recorder(path or self.output_path, self.record_format, self.resume.get("recorder"))
+
+
+    def open_metrics(self, path=None, callbacks=()):
+        """Opens the online metrics stream, writing a time-series CSV when "metrics" is enabled
+
+        Args:
+            path (str, optional): Metrics CSV path. Defaults to Data/Simulation/metrics_<NAME>.csv.
+            callbacks (iterable, optional): Functions called with each metrics row. Defaults to ().
+
+        Returns:
+            MetricsStream: Stream to pass to step()
+        """
+        return MetricsStream(self.kilobots.fps, (path or self.metrics_path) if self.metrics else None, callbacks,
+                             self.resume.get("metrics"))
+
+
+    def record(self, recorder):
+        """Records every Kilobot's state for the current frame
+
+        Args:
+            recorder (CsvRecorder or TrajectoryRecorder): Recorder receiving the sample
+        """
+        kilobots = self.kilobots
+        recorder.record(self.time_step, kilobots.x, kilobots.y, kilobots.theta, kilobots.neighbor_count,
+                        self.aggregates.com_x, self.aggregates.com_y, kilobots.est_heading, kilobots.heading_error)
+
+
+    def update_metrics(self, metrics):
+        """Emits the online metrics for the current frame
+
+        Args:
+            metrics (MetricsStream): Stream receiving the sample
+        """
+        metrics.update(self.time_step, self.aggregates, self.kilobots.heading_error if self.pattern else ())
+
+
+    def sense_floor(self, time_step):
+        """Reads the floor underneath every Kilobot in one gather and updates the heading estimates of the bots
+        whose reading changed. The floor is read once per physics step, at the step's end positions, so with a
+        coarse physics rate colour changes crossed within a step are missed or timed late.
+
+        Args:
+            time_step (int): Simulation frame
+        """
+        kilobots = self.kilobots
+        readings = self.floor.read(kilobots.x, kilobots.y)
+        previous = kilobots.floor_reading
+        changed = np.flatnonzero((readings != previous) & (readings >= 0))
+
+        if self.pattern == 1:
+            colors = self.floor.color_classes[readings[changed]]
+            new_color = (colors >= 0) & (colors != kilobots.color_sequence[changed, -1])
+            update_color_sequences(kilobots, changed[new_color], colors[new_color])
+
+        elif self.pattern == 2:
+            # A bot's first reading has nothing to compare against, and an unchanged reading leaves its
+            # velocity estimate as it was
+            compared = changed[previous[changed] >= 0]
+            update_intensity_headings(kilobots, compared, previous[compared], readings[compared], self.floor,
+                                      time_step, SQUARE_LENGTH)
+            kilobots.heading_error = heading_errors(kilobots.theta, kilobots.est_heading)
+
+        kilobots.floor_reading[changed] = readings[changed]
+
+
+    def step(self, recorder=None, metrics=None):
+        """Records (every 100 ms) and advances the simulation by one physics step unless paused. time_step counts
+        frames of 1/fps seconds, so it advances by frame_step frames per step.
+
+        Args:
+            recorder (optional): Recorder receiving the recorded samples. Defaults to None.
+            metrics (MetricsStream, optional): Stream receiving the online metrics. Defaults to None.
+        """
+        kilobots = self.kilobots
+        time_step = self.time_step
+
+        if kilobots and not self.paused:
+
+            # The first step at or after every 100 ms mark records
+            if time_step % self.record_frames < kilobots.frame_step:
+                if recorder is not None and self.recording:
+                    self.record(recorder)
+                if metrics is not None:
+                    self.update_metrics(metrics)
+            self.profiler.lap("record")
+
+            kilobots.step(self.alignment, self.detecting, self.tumbling)
+            self.aggregates = kilobots.aggregate()
+            self.profiler.lap("aggregates")
+
+            if self.pattern:
+                self.sense_floor(time_step)
+                self.profiler.lap("sensing")
+
+        self.time_step += kilobots.frame_step
+
+
+def run_headless(config, seed=None, path=None, metrics_path=None, callbacks=(), checkpoint_path=None,
+                 checkpoint_frames=None, resume=False, fork=None):
+    """Runs a simulation without a display or frame-rate cap until sim_time, writing sim_data_<NAME>
+
+    Args:
+        config (dict): Configuration in the layout of Data/config.json
+        seed (optional): Seed for the swarm random number generator. Defaults to None.
+        path (str, optional): Output path. Defaults to Data/Simulation/sim_data_<NAME> (.csv or .traj).
+        metrics_path (str, optional): Metrics CSV path. Defaults to Data/Simulation/metrics_<NAME>.csv.
+        callbacks (iterable, optional): Functions called with each online metrics row. Defaults to ().
+        checkpoint_path (str, optional): Checkpoint to save to (and resume from). Defaults to None.
+        checkpoint_frames (int, optional): Frames between checkpoints. Defaults to None (only at the end).
+        resume (bool, optional): Continue from checkpoint_path if it exists. Defaults to False.
+        fork (str, optional): Checkpoint to fork this run from with config and seed instead of spawning a new
+            swarm; time steps continue from the checkpoint. Defaults to None.
+
+    Returns:
+        Simulation: The finished simulation
+    """
+    if checkpoint_path is not None or fork is not None:
+        from checkpoint import load_checkpoint, save_checkpoint
+
+    if resume and checkpoint_path is not None and os.path.exists(checkpoint_path):
+        simulation = load_checkpoint(checkpoint_path)
+    elif fork is not None:
+        simulation = load_checkpoint(fork, config, seed)
+    else:
+        simulation = Simulation(config, seed)
+    if not simulation.recording:
+        raise ValueError("Headless runs need a finite sim_time, as an infinite one (interactive running) never ends")
+
+    with simulation.open_recorder(path) as recorder, simulation.open_metrics(metrics_path, callbacks) as metrics:
+
+        simulation.profiler.start()
+        while not simulation.finished:
+            simulation.step(recorder, metrics)
+            simulation.profiler.end_frame()
+            if (checkpoint_path is not None and checkpoint_frames
+                    and simulation.time_step % checkpoint_frames < simulation.kilobots.frame_step):
+                save_checkpoint(simulation, checkpoint_path, recorder, metrics)
+
+        if checkpoint_path is not None:
+            save_checkpoint(simulation, checkpoint_path, recorder, metrics)
+
+    simulation.profiler.dump(simulation.profile_path)
+    return simulation
@@ -0,0 +1,250 @@
+import numpy as np
+
+BACKENDS = ("brute", "grid", "kdtree")
+BRUTE_CHUNK = 2 ** 22                   # Maximum number of pairwise distances held in memory at once
+DENSE_CELLS = 2 ** 20                   # Grids with up to this many cells (or 4 per bot) get a cell start table
+
+
+def wrap(values, length):
+    """Wraps co-ordinates into [0, length)
+    """
+    values = np.mod(values, length)
+    # A tiny negative value wraps to length itself in floating point
+    return np.where(values >= length, 0.0, values)
+
+
+class NeighborIndex():
+
+    """Spatial index answering fixed-radius neighbour queries for a whole swarm at once
+    """
+    def __init__(self, x, y, radius, backend="grid", period=None, groups=None) -> None:
+        """Build the index over the current Kilobot positions
+
+        Args:
+            x (array): X co-ordinates
+            y (array): Y co-ordinates
+            radius (float): Neighbourhood radius (neighbours are strictly closer than this)
+            backend (str, optional): One of "brute", "grid" or "kdtree". Defaults to "grid".
+            period (tuple, optional): Width and height of a periodic domain, in which distances are measured to
+                the nearest image of each bot. Defaults to None (open domain).
+            groups (array, optional): Group of each bot (e.g. its ensemble replica); only bots of the same group
+                are neighbours. Defaults to None (one group).
+        """
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown neighbour backend '{backend}', expected one of {BACKENDS}")
+
+        self.x = np.asarray(x, dtype=float)
+        self.y = np.asarray(y, dtype=float)
+        self.radius = radius
+        self.period = period
+        self.groups = None if groups is None else np.asarray(groups, dtype=np.int64)
+        if period is not None:
+            self.x, self.y = wrap(self.x, period[0]), wrap(self.y, period[1])
+            # Fewer than three cells across would make the 3x3 block around a cell visit some cells twice
+            if backend == "grid" and min(period) // radius < 3:
+                backend = "brute"
+        self.backend = backend
+
+        if backend == "grid":
+            self.build_grid()
+        elif backend == "kdtree":
+            from scipy.spatial import cKDTree
+            self.tree = cKDTree(self.tree_points(np.arange(len(self))), boxsize=self.tree_boxsize())
+
+
+    def __len__(self):
+        return len(self.x)
+
+
+    def build_grid(self):
+        """Hashes every bot into a uniform grid of radius-sized cells, sorted by cell key. A periodic domain is
+        tiled by a whole number of cells at least radius wide, whose neighbours wrap around its edges.
+        """
+        if self.period is None:
+            cell_x = np.floor(self.x / self.radius).astype(np.int64)
+            cell_y = np.floor(self.y / self.radius).astype(np.int64)
+            # Pad by one cell on every side so that all neighbouring cells of a bot have a valid key
+            self.cell_min = (cell_x.min(initial=0) - 1, cell_y.min(initial=0) - 1)
+            self.cell_rows = cell_y.max(initial=0) - self.cell_min[1] + 2
+            num_cells = (cell_x.max(initial=0) - self.cell_min[0] + 2) * self.cell_rows
+        else:
+            self.cell_columns, self.cell_rows = (int(length // self.radius) for length in self.period)
+            cell_x = np.minimum(self.x * (self.cell_columns / self.period[0]), self.cell_columns - 1).astype(np.int64)
+            cell_y = np.minimum(self.y * (self.cell_rows / self.period[1]), self.cell_rows - 1).astype(np.int64)
+            self.cell_min = (0, 0)
+            num_cells = self.cell_columns * self.cell_rows
+        self.cell_x, self.cell_y = cell_x, cell_y
+        if self.groups is not None:
+            # Every group gets its own copy of the grid
+            self.group_cells = num_cells
+            num_cells *= self.groups.max(initial=0) + 1
+
+        keys = self.cell_key(cell_x, cell_y, self.groups)
+        self.order = np.argsort(keys, kind="stable")
+        self.sorted_keys = keys[self.order]
+
+        # Where the grid is small enough, look cells up in a table of where each cell's run of the sorted keys
+        # starts instead of binary searching the keys
+        self.cell_start = None
+        if num_cells <= max(DENSE_CELLS, 4 * len(keys)):
+            self.cell_start = np.concatenate(([0], np.cumsum(np.bincount(keys, minlength=num_cells))))
+
+
+    def cell_key(self, cell_x, cell_y, groups=None):
+        keys = (cell_x - self.cell_min[0]) * self.cell_rows + (cell_y - self.cell_min[1])
+        return keys if groups is None else keys + groups * self.group_cells
+
+
+    def tree_points(self, index):
+        """KD-tree co-ordinates of bots; groups are stacked along a third axis, further apart than the radius
+        """
+        if self.groups is None:
+            return np.column_stack((self.x[index], self.y[index]))
+        return np.column_stack((self.x[index], self.y[index], self.groups[index] * 4.0 * self.radius))
+
+
+    def tree_boxsize(self):
+        if self.period is None:
+            return None
+        if self.groups is None:
+            return self.period
+        # Leave a gap after the last group so that it does not wrap around next to the first
+        return (*self.period, (self.groups.max(initial=0) + 2) * 4.0 * self.radius)
+
+
+    def query_pairs(self, index=None):
+        """Finds every (query, neighbour) pair closer than the radius, each query bot included as its own
+        neighbour
+
+        Args:
+            index (array, optional): Indices of the querying bots. Defaults to every bot.
+
+        Returns:
+            tuple: Positions into index of the querying bots and indices of their neighbours
+        """
+        index = np.arange(len(self)) if index is None else np.asarray(index, dtype=np.int64)
+
+        if self.backend == "grid":
+            rows, cols = self.grid_candidates(index)
+        elif self.backend == "kdtree":
+            rows, cols = self.kdtree_candidates(index)
+        else:
+            return self.brute_pairs(index)
+
+        dx, dy = self.separation(self.x[index[rows]] - self.x[cols], self.y[index[rows]] - self.y[cols])
+        within = (dx ** 2 + dy ** 2) < self.radius ** 2
+        return rows[within], cols[within]
+
+
+    def separation(self, dx, dy):
+        """Shortest separation between bots, to the nearest image in a periodic domain
+        """
+        if self.period is None:
+            return dx, dy
+        width, height = self.period
+        return dx - width * np.round(dx / width), dy - height * np.round(dy / height)
+
+
+    def grid_candidates(self, index):
+        """Gathers every bot in the 3x3 block of cells around each query bot
+        """
+        starts, lengths, rows = [], [], []
+        positions = np.arange(len(index))
+
+        for offset_x in (-1, 0, 1):
+            for offset_y in (-1, 0, 1):
+                neighbor_x, neighbor_y = self.cell_x[index] + offset_x, self.cell_y[index] + offset_y
+                if self.period is not None:
+                    neighbor_x, neighbor_y = neighbor_x % self.cell_columns, neighbor_y % self.cell_rows
+                keys = self.cell_key(neighbor_x, neighbor_y, None if self.groups is None else self.groups[index])
+                if self.cell_start is not None:
+                    start, end = self.cell_start[keys], self.cell_start[keys + 1]
+                else:
+                    start = np.searchsorted(self.sorted_keys, keys, side="left")
+                    end = np.searchsorted(self.sorted_keys, keys, side="right")
+                starts.append(start)
+                lengths.append(end - start)
+                rows.append(positions)
+
+        starts, lengths = np.concatenate(starts), np.concatenate(lengths)
+        rows = np.repeat(np.concatenate(rows), lengths)
+        # Position of each candidate within its cell's run of the sorted keys
+        within_cell = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        cols = self.order[np.repeat(starts, lengths) + within_cell]
+        return rows, cols
+
+
+    def kdtree_candidates(self, index):
+        """Gathers every bot within the radius (inclusive) of each query bot from the KD-tree
+        """
+        found = self.tree.query_ball_point(self.tree_points(index), self.radius, return_sorted=False)
+        lengths = np.fromiter((len(neighbors) for neighbors in found), dtype=np.int64, count=len(found))
+        rows = np.repeat(np.arange(len(index)), lengths)
+        cols = np.concatenate(found).astype(np.int64) if len(found) else np.empty(0, dtype=np.int64)
+        return rows, cols
+
+
+    def brute_pairs(self, index):
+        """Compares each query bot against every bot, holding at most BRUTE_CHUNK distances at a time
+        """
+        rows, cols = [], []
+        chunk = max(1, BRUTE_CHUNK // max(1, len(self)))
+
+        for start in range(0, len(index), chunk):
+            query = index[start:start + chunk]
+            dx, dy = self.separation(self.x[query, None] - self.x[None, :], self.y[query, None] - self.y[None, :])
+            within = (dx ** 2 + dy ** 2) < self.radius ** 2
+            if self.groups is not None:
+                within &= self.groups[query, None] == self.groups[None, :]
+            chunk_rows, chunk_cols = np.nonzero(within)
+            rows.append(chunk_rows + start)
+            cols.append(chunk_cols)
+
+        if not rows:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        return np.concatenate(rows), np.concatenate(cols)
+
+
+    def neighbor_counts(self, index=None):
+        """Counts the bots within the radius of each query bot (itself included)
+
+        Args:
+            index (array, optional): Indices of the querying bots. Defaults to every bot.
+
+        Returns:
+            array: Neighbour count per query bot
+        """
+        num_queries = len(self) if index is None else len(index)
+        rows, _ = self.query_pairs(index)
+        return np.bincount(rows, minlength=num_queries)
+
+
+    def neighbor_lists(self, index=None):
+        """Lists the bots within the radius of each query bot (itself included)
+
+        Args:
+            index (array, optional): Indices of the querying bots. Defaults to every bot.
+
+        Returns:
+            list: Array of neighbour indices per query bot
+        """
+        num_queries = len(self) if index is None else len(index)
+        rows, cols = self.query_pairs(index)
+        order = np.argsort(rows, kind="stable")
+        splits = np.cumsum(np.bincount(rows, minlength=num_queries))[:-1]
+        return np.split(cols[order], splits)
+
+
+    def neighbor_sums(self, values, index=None):
+        """Sums per-bot values over the neighbourhood of each query bot (itself included)
+
+        Args:
+            values (array): Value per bot, e.g. sin(theta)
+            index (array, optional): Indices of the querying bots. Defaults to every bot.
+
+        Returns:
+            array: Neighbourhood sum per query bot
+        """
+        num_queries = len(self) if index is None else len(index)
+        rows, cols = self.query_pairs(index)
+        return np.bincount(rows, weights=np.asarray(values)[cols], minlength=num_queries)
@@ -0,0 +1,256 @@
+import math
+import numpy as np
+from spatial import NeighborIndex
+
+SPAWN_METHODS = ("uniform", "poisson", "lattice")
+SPAWN_SHAPES = ("box", "disc")
+SPAWN_PRESETS = {
+    "sparse": {"spawn": "poisson", "spawn_shape": "box", "spawn_density": 0.02},
+    "dense": {"spawn": "poisson", "spawn_shape": "box", "spawn_density": 0.3},
+    "cluster": {"spawn": "poisson", "spawn_shape": "disc", "spawn_density": 0.35},
+    "crystal": {"spawn": "lattice", "spawn_shape": "box", "spawn_density": 0.6},
+}
+MAX_DENSITY = {"poisson": 0.4, "lattice": 0.8}  # Area fractions the separating methods reliably reach
+MAX_ROUNDS = 100                # Candidate batches tried by poisson_disk before giving up
+HEX_CELL_AREA = math.sqrt(3) / 2        # Area per point of a hexagonal lattice with unit spacing
+
+
+def spawn_settings(config_sim):
+    """Reads the spawn method, shape and density from the simulation configuration, or from "spawn_preset"
+    when one is set
+
+    Args:
+        config_sim (dict): "simulation" section of the configuration
+
+    Returns:
+        tuple: Method, shape and density (area fraction covered by the bots, None for the spawn box)
+    """
+    preset = config_sim.get("spawn_preset")
+    if preset is not None and preset not in SPAWN_PRESETS:
+        raise ValueError(f"Unknown spawn preset '{preset}', expected one of {tuple(SPAWN_PRESETS)}")
+    settings = SPAWN_PRESETS[preset] if preset is not None else config_sim
+
+    method = settings.get("spawn", "uniform")
+    shape = settings.get("spawn_shape", "box")
+    if method not in SPAWN_METHODS:
+        raise ValueError(f"Unknown spawn method '{method}', expected one of {SPAWN_METHODS}")
+    if shape not in SPAWN_SHAPES:
+        raise ValueError(f"Unknown spawn shape '{shape}', expected one of {SPAWN_SHAPES}")
+    density = settings.get("spawn_density")
+    if density is not None and method in MAX_DENSITY and density > MAX_DENSITY[method]:
+        raise ValueError(f"Spawn density {density:g} is above the {MAX_DENSITY[method]:g} that '{method}' "
+                         f"placement reaches")
+    return method, shape, density
+
+
+def spawn_area(num_bots, radius, density):
+    """Area in which num_bots Kilobots of the given radius cover the given area fraction
+    """
+    return num_bots * math.pi * radius ** 2 / density
+
+
+class SpawnRegion():
+
+    """Box or disc that starting positions are drawn from
+    """
+    def __init__(self, shape, bounds) -> None:
+        """Create the region
+
+        Args:
+            shape (str): "box" or "disc" (the disc inscribed in the bounds)
+            bounds (tuple): Left, right, top and bottom edges of the bounding box
+        """
+        self.shape = shape
+        self.bounds = bounds
+        left, right, top, bottom = bounds
+        self.centre = ((left + right) / 2, (top + bottom) / 2)
+        self.half_width, self.half_height = (right - left) / 2, (bottom - top) / 2
+        if shape == "disc":
+            self.half_width = self.half_height = min(self.half_width, self.half_height)
+
+
+    @classmethod
+    def around(cls, shape, centre, area, limits=None):
+        """Region of a given area centred on a point, e.g. sized for a target density. A box is square unless
+        that overruns the limits, in which case it is narrowed to them and lengthened along the other side.
+
+        Args:
+            shape (str): "box" or "disc"
+            centre (tuple): X and y co-ordinates of the centre
+            area (float): Area of the region
+            limits (tuple, optional): Width and height the region must fit in (see largest_area). Defaults to
+                None.
+
+        Returns:
+            SpawnRegion: The region
+        """
+        if shape == "disc":
+            half_width = half_height = math.sqrt(area / math.pi)
+        else:
+            half_width = half_height = math.sqrt(area) / 2
+            if limits is not None and 2 * half_width > limits[0]:
+                half_width = limits[0] / 2
+                half_height = area / limits[0] / 2
+            elif limits is not None and 2 * half_height > limits[1]:
+                half_height = limits[1] / 2
+                half_width = area / limits[1] / 2
+        return cls(shape, (centre[0] - half_width, centre[0] + half_width,
+                           centre[1] - half_height, centre[1] + half_height))
+
+
+    @staticmethod
+    def largest_area(shape, limits):
+        """Area of the largest box or disc that fits in the limits (width and height)
+        """
+        if shape == "disc":
+            return math.pi * min(limits) ** 2 / 4
+        return limits[0] * limits[1]
+
+
+    @property
+    def area(self):
+        if self.shape == "disc":
+            return math.pi * self.half_width ** 2
+        return 4 * self.half_width * self.half_height
+
+
+    def contains(self, x, y):
+        dx, dy = x - self.centre[0], y - self.centre[1]
+        if self.shape == "disc":
+            return dx ** 2 + dy ** 2 <= self.half_width ** 2
+        return (np.abs(dx) <= self.half_width) & (np.abs(dy) <= self.half_height)
+
+
+    def uniform(self, rng, num_bots):
+        """Independent uniform positions inside the region
+
+        Returns:
+            tuple: X and y co-ordinates
+        """
+        if self.shape == "disc":
+            radius = self.half_width * np.sqrt(rng.uniform(0, 1, num_bots))
+            angle = rng.uniform(0, 2 * math.pi, num_bots)
+            return self.centre[0] + radius * np.cos(angle), self.centre[1] + radius * np.sin(angle)
+        left, right, top, bottom = self.bounds
+        return rng.uniform(left, right, num_bots), rng.uniform(top, bottom, num_bots)
+
+
+def poisson_disk(rng, num_bots, region, min_distance):
+    """Random positions at least min_distance apart, by dart throwing in batches. Accepted points are held in a
+    background grid of min_distance / sqrt(2) cells, which holds at most one point per cell, so each candidate
+    is checked against the 5x5 cells around it; candidates of the same batch that conflict are resolved in
+    favour of the earlier one.
+
+    Args:
+        rng (Generator): Random number generator
+        num_bots (int): Number of positions
+        region (SpawnRegion): Region to place them in
+        min_distance (float): Minimum distance between any two positions
+
+    Returns:
+        tuple: X and y co-ordinates
+    """
+    if min_distance <= 0:
+        return region.uniform(rng, num_bots)
+
+    cell = min_distance / math.sqrt(2)
+    columns = int(math.ceil(2 * region.half_width / cell)) + 1
+    rows = int(math.ceil(2 * region.half_height / cell)) + 1
+    # Padded by two cells on every side so that the 5x5 block around any cell is in range
+    grid = np.full((columns + 4, rows + 4), -1, dtype=np.int64)
+    x, y = np.empty(num_bots), np.empty(num_bots)
+    left, top = region.centre[0] - region.half_width, region.centre[1] - region.half_height
+    placed = 0
+
+    for _ in range(MAX_ROUNDS):
+        if placed == num_bots:
+            break
+        cand_x, cand_y = region.uniform(rng, max(2 * (num_bots - placed), 64))
+        cell_x = ((cand_x - left) / cell).astype(np.int64) + 2
+        cell_y = ((cand_y - top) / cell).astype(np.int64) + 2
+
+        free = grid[cell_x, cell_y] < 0
+        for offset_x in range(-2, 3):
+            for offset_y in range(-2, 3):
+                other = grid[cell_x + offset_x, cell_y + offset_y]
+                close = other >= 0
+                close[close] = ((x[other[close]] - cand_x[close]) ** 2 +
+                                (y[other[close]] - cand_y[close]) ** 2) < min_distance ** 2
+                free &= ~close
+
+        cand_x, cand_y, cell_x, cell_y = cand_x[free], cand_y[free], cell_x[free], cell_y[free]
+        pair_rows, pair_cols = NeighborIndex(cand_x, cand_y, min_distance).query_pairs()
+        conflicts = np.unique(pair_rows[pair_cols < pair_rows])
+        keep = np.ones(len(cand_x), dtype=bool)
+        keep[conflicts] = False
+        keep[np.flatnonzero(keep)[num_bots - placed:]] = False
+
+        accepted = np.count_nonzero(keep)
+        x[placed:placed + accepted], y[placed:placed + accepted] = cand_x[keep], cand_y[keep]
+        grid[cell_x[keep], cell_y[keep]] = np.arange(placed, placed + accepted)
+        placed += accepted
+
+    if placed < num_bots:
+        raise ValueError(f"Could only place {placed} of {num_bots} Kilobots {min_distance:g} apart in the spawn "
+                         f"region; lower the spawn density or enlarge the region")
+    return x, y
+
+
+def jittered_lattice(rng, num_bots, region, min_distance):
+    """Positions on a randomly offset hexagonal lattice, spaced as widely as the region allows, each jittered
+    by up to half the slack between the lattice spacing and min_distance so that no two come closer than it
+
+    Args:
+        rng (Generator): Random number generator
+        num_bots (int): Number of positions
+        region (SpawnRegion): Region to place them in
+        min_distance (float): Minimum distance between any two positions
+
+    Returns:
+        tuple: X and y co-ordinates
+    """
+    if not num_bots:
+        return np.empty(0), np.empty(0)
+    spacing = math.sqrt(region.area / (num_bots * HEX_CELL_AREA))
+
+    while True:
+        if spacing < min_distance:
+            raise ValueError(f"{num_bots} Kilobots do not fit {min_distance:g} apart in the spawn region; lower "
+                             f"the spawn density or enlarge the region")
+        row_height = spacing * HEX_CELL_AREA
+        offset_x, offset_y = rng.uniform(0, spacing), rng.uniform(0, row_height)
+        columns = np.arange(-region.half_width - spacing + offset_x, region.half_width + spacing, spacing)
+        rows = np.arange(-region.half_height - row_height + offset_y, region.half_height + row_height, row_height)
+        site_x = columns[None, :] + (np.arange(len(rows)) % 2 * spacing / 2)[:, None]
+        site_y = np.broadcast_to(rows[:, None], site_x.shape)
+        site_x, site_y = site_x.ravel() + region.centre[0], site_y.ravel() + region.centre[1]
+        inside = region.contains(site_x, site_y)
+        if np.count_nonzero(inside) >= num_bots:
+            break
+        spacing *= 0.98
+
+    chosen = rng.choice(np.flatnonzero(inside), num_bots, replace=False)
+    jitter = (spacing - min_distance) / 2 * np.sqrt(rng.uniform(0, 1, num_bots))
+    angle = rng.uniform(0, 2 * math.pi, num_bots)
+    return site_x[chosen] + jitter * np.cos(angle), site_y[chosen] + jitter * np.sin(angle)
+
+
+def spawn_positions(rng, num_bots, region, method="uniform", min_distance=0):
+    """Starting positions of a swarm
+
+    Args:
+        rng (Generator): Random number generator
+        num_bots (int): Number of positions
+        region (SpawnRegion): Region to place them in
+        method (str, optional): "uniform" (independent, may overlap), "poisson" (Poisson-disk) or "lattice"
+            (jittered hexagonal lattice). Defaults to "uniform".
+        min_distance (float, optional): Minimum separation of the "poisson" and "lattice" methods. Defaults to 0.
+
+    Returns:
+        tuple: X and y co-ordinates
+    """
+    if method == "poisson":
+        return poisson_disk(rng, num_bots, region, min_distance)
+    if method == "lattice":
+        return jittered_lattice(rng, num_bots, region, min_distance)
+    return region.uniform(rng, num_bots)
@@ -0,0 +1,925 @@
+import math
+import numpy as np
+from kilobots import Color, STATES, load_config
+from spatial import NeighborIndex
+from scheduler import EventScheduler, DETECT, PAUSE_END, TUMBLE
+from trails import TrailBuffer
+from spawning import MAX_DENSITY, SpawnRegion, spawn_area, spawn_positions, spawn_settings
+from collisions import confine, resolve_collisions
+from spatial import wrap
+from profiling import PhaseProfiler
+
+RUNNING, TUMBLING, ADJUSTING = 0, 1, 2
+BOUNDARIES = ("open", "walls", "reflect", "periodic")
+UPDATE_ORDERS = ("sequential", "simultaneous")
+STATUS_COLORS = (STATES["RUNNING"], STATES["TUMBLING"], STATES["ADJUSTING"])
+DETECTION_COLORS = (Color.BLACK.value, Color.BLUE.value)
+STATE_ARRAYS = ("x", "y", "theta", "step_since_tumble", "step_since_adjust", "neighbor_count", "tumbling", "adjusting",
+                "detected", "state", "next_detect", "pause_start", "pause_end", "tumble_budget", "segment_start",
+                "segment_steps", "tumble_frame", "tumbled", "floor_reading", "est_heading", "heading_error",
+                "color_sequence", "x_vel", "y_vel", "moved_frame", "replica")
+
+
+class SwarmState():
+
+    """Struct-of-arrays swarm of Kilobots, advanced for every bot at once in a single batched step
+    """
+    def __init__(self, num_bots=None, config=None, seed=None, backend=None) -> None:
+        """Initialise the swarm arrays from a configuration and spawn the starting Kilobots
+
+        Args:
+            num_bots (int, optional): Number of Kilobots to spawn. Defaults to the configured "num_bots".
+            config (dict, optional): Configuration in the layout of Data/config.json. Defaults to load_config().
+            seed (optional): Seed for the swarm random number generator, or a list of seeds to simulate one
+                independent replica of the swarm per seed (see replica). Defaults to None.
+            backend (str, optional): Neighbour search backend ("brute", "grid" or "kdtree"). Defaults to the
+                configured "neighbor_backend".
+        """
+        if config is None:
+            config = load_config()
+        config_sim = config["simulation"]
+
+        self.configure(config, backend)
+        seeds = list(seed) if isinstance(seed, (list, tuple)) else [seed]
+        self.replicas = len(seeds)
+        self.rngs = [np.random.default_rng(seed) for seed in seeds]     # Random stream of each replica
+        self.scheduler = EventScheduler()
+        self.frame = 0                  # Frames stepped so far
+        self.detect_clock = 0           # Frames stepped with detection active
+        self.hazard_active = True       # Whether tumbling was active on the last step
+
+        self.x = np.empty(0)
+        self.y = np.empty(0)
+        self.theta = np.empty(0)
+        self.step_since_tumble = np.empty(0, dtype=np.int64)
+        self.step_since_adjust = np.empty(0, dtype=np.int64)
+        self.neighbor_count = np.empty(0, dtype=np.int64)
+        self.tumbling = np.empty(0, dtype=bool)
+        self.adjusting = np.empty(0, dtype=bool)
+        self.detected = np.empty(0, dtype=bool)
+        self.state = np.empty(0, dtype=np.int8)
+        self.next_detect = np.empty(0, dtype=np.int64)      # Detection clock of the next neighbour detection
+        self.pause_start = np.empty(0, dtype=np.int64)      # First frame counted by the current tumble/adjust pause
+        self.pause_end = np.empty(0, dtype=np.int64)        # Last frame of the current pause (-1 while running)
+        self.tumble_budget = np.empty(0)                    # Exp(1) hazard left at the start of the hazard segment
+        self.segment_start = np.empty(0, dtype=np.int64)    # First frame of the current hazard segment
+        self.segment_steps = np.empty(0, dtype=np.int64)    # step_since_tumble before the segment's first frame
+        self.tumble_frame = np.empty(0, dtype=np.int64)     # Frame of the next tumble (-1 if none is due)
+        self.tumbled = np.empty(0, dtype=np.int64)          # Bots that tumbled on the last step
+        self.contacts = 0                                   # Overlapping pairs found on the last step
+        self.moved_frame = np.empty(0, dtype=np.int64)      # First frame whose motion is not applied yet
+        self.moved = np.empty(0, dtype=bool)                # Bots that ran during the current step
+        self.floor_reading = np.empty(0, dtype=np.int32)    # Last floor pattern reading (palette index, -1 for none)
+        self.est_heading = np.empty(0)                      # Heading estimated from the floor pattern
+        self.heading_error = np.empty(0)                    # Absolute error of the heading estimate
+        self.color_sequence = np.empty((0, 3), dtype=np.int8)  # Last three floor colour codes, oldest first (-1 for none)
+        self.x_vel = np.empty(0)                            # Velocity estimated from the intensity pattern
+        self.y_vel = np.empty(0)
+        self.replica = np.empty(0, dtype=np.int32)          # Ensemble replica the bot belongs to
+        self.trails = TrailBuffer(config_sim.get("trail_length", 0), config_sim.get("trail_decimation", 1))
+        self.profiler = PhaseProfiler()            # Replaced by an enabled profiler to time the step phases
+        self.views = []
+
+        for replica in range(self.replicas):
+            self.spawn(config_sim["num_bots"] if num_bots is None else num_bots, replica)
+
+
+    def configure(self, config, backend=None):
+        """Sets the domain and Kilobot parameters from a configuration
+
+        Args:
+            config (dict): Configuration in the layout of Data/config.json
+            backend (str, optional): Neighbour search backend. Defaults to the configured "neighbor_backend".
+        """
+        config_sim, config_bots = config["simulation"], config["kilobots"]
+
+        self.config = config
+        self.width, self.height = config_sim["width"], config_sim["height"]
+        self.fps = config_sim["fps"]
+        physics_rate = config_sim.get("physics_rate", self.fps)
+        self.frame_step, remainder = divmod(self.fps, physics_rate)
+        if remainder or self.frame_step < 1:
+            raise ValueError(f"Physics rate must divide fps ({self.fps}), got {physics_rate}")
+        self.frame_step = int(self.frame_step)           # Frames (of 1/fps seconds) advanced per step
+        self.backend = config_sim.get("neighbor_backend", "grid") if backend is None else backend
+        self.collisions = config_sim.get("collisions", False)
+        self.boundary = config_sim.get("boundary", "open")
+        if self.boundary not in BOUNDARIES:
+            raise ValueError(f"Unknown boundary '{self.boundary}', expected one of {BOUNDARIES}")
+        self.update_order = config_sim.get("update_order", "sequential")
+        if self.update_order not in UPDATE_ORDERS:
+            raise ValueError(f"Unknown update order '{self.update_order}', expected one of {UPDATE_ORDERS}")
+
+        scale = config_bots["scale"]
+        self.speed = config_bots["speed"] / self.fps * scale
+        self.radius = config_bots["radius"] * scale
+        self.detect_radius = config_bots["detect_radius"] * scale
+        self.tumble_rate = config_bots["tumble_rate"]
+        self.tumble_frames = self.milliseconds_to_frames(config_bots["tumble_delay"])
+        self.adjust_frames = self.milliseconds_to_frames(config_bots["adjust_delay"])
+        self.adjust_tick_frames = self.milliseconds_to_frames(config_bots["adjust_rate"])
+        self.spawn_box = (self.width / 4, 3 * self.width / 4, self.height / 4, 3 * self.height / 4)
+        self.spawn_method, self.spawn_shape, self.spawn_density = spawn_settings(config_sim)
+
+
+    def reconfigure(self, config):
+        """Switches a running swarm to another configuration (e.g. when forking variants from a checkpoint).
+        The hazard accumulated so far is spent at the old tumble rate and the next tumbles are solved again at
+        the new one; pauses and detections already scheduled keep their timing.
+
+        Args:
+            config (dict): Configuration in the layout of Data/config.json
+        """
+        active = self.hazard_active
+        self.set_hazard_active(False)
+        self.configure(config)
+        self.set_hazard_active(active)
+
+
+    def get_state(self):
+        """Snapshot of the full swarm state, for checkpoints
+
+        Returns:
+            tuple: Array name mapped to a copy of the array, and the JSON-serialisable scalar state
+        """
+        arrays = {name: getattr(self, name).copy() for name in STATE_ARRAYS}
+        arrays.update({f"scheduler/{name}": array for name, array in self.scheduler.get_state().items()})
+        arrays.update({f"trails/{name}": array.copy() for name, array in self.trails.get_state().items()})
+        meta = {
+            "config": self.config,
+            "backend": self.backend,
+            "frame": self.frame,
+            "detect_clock": self.detect_clock,
+            "hazard_active": self.hazard_active,
+            "rngs": [rng.bit_generator.state for rng in self.rngs],
+            "trails": {"capacity": self.trails.capacity, "decimation": self.trails.decimation},
+        }
+        return arrays, meta
+
+
+    @classmethod
+    def from_state(cls, arrays, meta):
+        """Restores a swarm exactly as it was snapshotted by get_state
+
+        Args:
+            arrays (dict): Array name mapped to array
+            meta (dict): Scalar state
+
+        Returns:
+            SwarmState: Restored swarm
+        """
+        swarm = cls(0, meta["config"], [None] * len(meta["rngs"]), meta["backend"])
+        for name in STATE_ARRAYS:
+            setattr(swarm, name, np.array(arrays[name], dtype=getattr(swarm, name).dtype))
+        swarm.moved = np.zeros(len(swarm), dtype=bool)
+        swarm.scheduler.set_state({name.split("/", 1)[1]: array for name, array in arrays.items()
+                                   if name.startswith("scheduler/")})
+        swarm.trails = TrailBuffer(meta["trails"]["capacity"], meta["trails"]["decimation"])
+        swarm.trails.set_state({name.split("/", 1)[1]: array for name, array in arrays.items()
+                                if name.startswith("trails/")})
+        swarm.frame = meta["frame"]
+        swarm.detect_clock = meta["detect_clock"]
+        swarm.hazard_active = meta["hazard_active"]
+        for rng, state in zip(swarm.rngs, meta["rngs"]):
+            rng.bit_generator.state = state
+        return swarm
+
+
+    def __len__(self):
+        return len(self.x)
+
+
+    def __getitem__(self, index):
+        """Kilobot-compatible view of a single bot, created once and cached
+
+        Args:
+            index (int): Kilobot ID
+
+        Returns:
+            KilobotView: Read-only view of this swarm's arrays
+        """
+        while len(self.views) < len(self):
+            self.views.append(KilobotView(self, len(self.views)))
+        return self.views[index]
+
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+
+    @property
+    def adjust_tick(self):
+        return self.next_detect - self.detect_clock
+
+
+    @property
+    def step_since_run(self):
+        return np.where(self.pause_end >= 0, np.maximum(self.frame - self.pause_start, 0), 0)
+
+
+    def milliseconds_to_frames(self, time):
+        return int(time / 1000 * self.fps)
+
+
+    def frames_to_milliseconds(self, frame):
+        return 1000 * frame / self.fps
+
+
+    def spawn_region(self, num_bots):
+        """Region the starting Kilobots are placed in: the spawn box (or the disc inscribed in it), or a box or
+        disc around the domain centre sized so that num_bots cover the configured "spawn_density". Separated
+        bots that overfill the spawn box are spread over a region grown to hold them instead. Sized regions
+        stay a radius clear of the domain edges, so that no boundary mode moves the starting bots.
+        """
+        if self.spawn_density is None:
+            region = SpawnRegion(self.spawn_shape, self.spawn_box)
+            capacity = MAX_DENSITY.get(self.spawn_method)
+            if capacity is None or spawn_area(num_bots, self.radius, capacity) <= region.area:
+                return region
+            density = capacity
+        else:
+            density = self.spawn_density
+        area = spawn_area(num_bots, self.radius, density)
+        limits = (self.width - 2 * self.radius, self.height - 2 * self.radius)
+        if area > SpawnRegion.largest_area(self.spawn_shape, limits):
+            raise ValueError(f"{num_bots} Kilobots at a spawn density of {density:g} need an area of {area:.0f}, "
+                             f"more than a {self.spawn_shape} in the {self.width:g} x {self.height:g} domain holds; "
+                             f"lower num_bots, raise the density or enlarge the domain")
+        return SpawnRegion.around(self.spawn_shape, (self.width / 2, self.height / 2), area, limits)
+
+
+    def spawn(self, num_bots, replica=0):
+        """Adds Kilobots placed by the configured spawn method ("uniform", or "poisson" and "lattice", which
+        keep them at least 2 * RADIUS apart) with random headings
+
+        Args:
+            num_bots (int): Number of Kilobots to add
+            replica (int, optional): Ensemble replica to add them to. Defaults to 0.
+        """
+        rng = self.rngs[replica]
+        x, y = spawn_positions(rng, num_bots, self.spawn_region(num_bots), self.spawn_method, 2 * self.radius)
+        theta = rng.uniform(0, 2 * math.pi, num_bots)
+        self.add(x, y, theta, replica)
+        if self.boundary != "open":
+            self.apply_boundary(np.arange(len(self) - num_bots, len(self)))
+
+
+    def add(self, x, y, theta, replica=0):
+        """Adds running Kilobots at the given placements (typically a mouse placement)
+
+        Args:
+            x (float or array): X co-ordinate(s)
+            y (float or array): Y co-ordinate(s)
+            theta (float or array): Heading(s)
+            replica (int, optional): Ensemble replica to add them to. Defaults to 0.
+        """
+        x, y, theta = np.broadcast_arrays(np.atleast_1d(x), np.atleast_1d(y), np.atleast_1d(theta))
+        num_bots = len(x)
+        bots = np.arange(len(self), len(self) + num_bots)
+
+        def extend(name, values):
+            array = getattr(self, name)
+            setattr(self, name, np.concatenate((array, np.broadcast_to(values, num_bots).astype(array.dtype))))
+
+        extend("x", x)
+        extend("y", y)
+        extend("theta", theta)
+        for name in ("step_since_tumble", "step_since_adjust", "neighbor_count", "tumbling", "adjusting",
+                     "detected", "state", "pause_start", "segment_steps"):
+            extend(name, 0)
+        extend("next_detect", self.detect_clock)
+        extend("pause_end", -1)
+        extend("moved_frame", self.frame)
+        extend("moved", False)
+        extend("segment_start", self.frame)
+        extend("tumble_frame", -1)
+        extend("floor_reading", -1)
+        extend("est_heading", math.nan)
+        extend("heading_error", math.nan)
+        extend("x_vel", 0)
+        extend("y_vel", 0)
+        self.color_sequence = np.concatenate((self.color_sequence, np.full((num_bots, 3), -1, dtype=np.int8)))
+        extend("replica", replica)
+        extend("tumble_budget", self.rngs[replica].standard_exponential(num_bots))
+        self.trails.extend(num_bots)
+
+        self.scheduler.schedule(DETECT, self.detect_clock, bots)
+        if self.hazard_active:
+            self.schedule_tumble(bots)
+
+
+    def step(self, alignment=0, detecting=True, tumbling=True):
+        """Advances every Kilobot by one physics step of frame_step frames: neighbour detection, run/tumble/adjust
+        events and tumbling. Timers and the tumble hazard are kept in frames of 1/fps seconds, so the events
+        of every frame covered by the step happen on the same frames as they would one frame per step, and
+        only bots with a due detection, pause end or tumble event are processed. Running bots are moved
+        lazily (see advance) up to each event that depends on their position or heading, and to the step end.
+
+        Args:
+            alignment (int, optional): Alignment mode (0: none, 1: align, -1: anti-align). Defaults to 0.
+            detecting (bool, optional): (de)activate neighbour detection. Defaults to True.
+            tumbling (bool, optional): (de)activate tumbling. Defaults to True.
+        """
+        if tumbling != self.hazard_active:
+            self.set_hazard_active(tumbling)
+        self.moved[:] = False
+        tumbled = []
+        last = self.frame + self.frame_step - 1
+
+        for frame in range(self.frame, last + 1):
+            self.frame = frame
+            if detecting:
+                self.neighbor_detect(alignment)
+            self.profiler.lap("detect")
+            if frame == last:
+                self.update_states()
+            self.events()
+            if tumbling:
+                tumbled.append(self.tumble())
+            self.profiler.lap("motion")
+
+        self.frame += 1
+        self.advance(self.frame)
+        self.collide()
+        if self.trails.enabled:
+            moved = np.flatnonzero(self.moved)
+            self.trails.append(moved, self.x[moved], self.y[moved])
+        self.tumbled = np.concatenate(tumbled) if tumbled else np.empty(0, dtype=np.int64)
+        self.profiler.lap("motion")
+
+
+    def advance(self, frame, bots=None):
+        """Applies the motion of the frames before a frame that has not been applied yet. A bot's heading and
+        running state only change on its own events, which advance it first, so running bots move in one
+        straight segment per call.
+
+        Args:
+            frame (int): First frame not to apply
+            bots (array, optional): Kilobot indices. Defaults to every bot.
+        """
+        index = slice(None) if bots is None else bots
+        frames = frame - self.moved_frame[index]
+        running = ~(self.tumbling[index] | self.adjusting[index]) & (frames > 0)
+        self.moved_frame[index] = frame
+        moving = running if bots is None else bots[running]
+        frames = frames[running]
+        if not len(frames):
+            return
+
+        theta = self.theta[moving]
+        self.x[moving] += self.speed * frames * np.cos(theta)
+        self.y[moving] += self.speed * frames * np.sin(theta)
+        self.step_since_tumble[moving] += frames
+        self.moved[moving] = True
+        if self.boundary != "open":
+            self.apply_boundary(np.flatnonzero(moving) if bots is None else moving)
+
+
+    def apply_boundary(self, bots):
+        """Brings bots that left the domain back according to the boundary mode: "walls" stop them at the
+        wall, "reflect" mirrors their path (and heading) off it and "periodic" wraps them around the torus.
+        As every bot moves in a straight line between its events, this gives the same result as applying the
+        boundary every frame.
+
+        Args:
+            bots (array): Kilobot indices
+        """
+        x, y = self.x[bots], self.y[bots]
+        if self.boundary == "walls":
+            confine(x, y, self.radius, self.width, self.height)
+        elif self.boundary == "periodic":
+            x, y = wrap(x, self.width), wrap(y, self.height)
+        elif self.boundary == "reflect":
+            # Unfold the path into the strip between the walls: an odd number of reflections flips the heading
+            theta = self.theta[bots]
+            x, flip_x = reflect(x, self.radius, self.width - self.radius)
+            y, flip_y = reflect(y, self.radius, self.height - self.radius)
+            theta = np.where(flip_x, math.pi - theta, theta)
+            theta = np.where(flip_y, -theta, theta)
+            self.theta[bots] = theta % (2 * math.pi)
+        self.x[bots], self.y[bots] = x, y
+
+
+    def collide(self):
+        """Separates overlapping bots at the end of every step (when "collisions" is enabled), keeping them
+        inside walls and wrapping them around a periodic domain
+        """
+        if not self.collisions or not len(self):
+            return
+        walls = (self.width, self.height) if self.boundary in ("walls", "reflect") else None
+        self.contacts = resolve_collisions(self.x, self.y, self.radius, self.backend, walls, self.period, self.groups)
+
+
+    @property
+    def groups(self):
+        """Replica of every bot for the neighbour search, or None with a single replica
+        """
+        return self.replica if self.replicas > 1 else None
+
+
+    def reseed(self, seed):
+        """Restarts the random streams, e.g. to fork replicas from a checkpoint
+
+        Args:
+            seed: Seed, or a list of one seed per replica (a single seed is split into independent streams)
+        """
+        if isinstance(seed, (list, tuple)):
+            if len(seed) != self.replicas:
+                raise ValueError(f"Expected {self.replicas} seeds, got {len(seed)}")
+            self.rngs = [np.random.default_rng(s) for s in seed]
+        elif self.replicas == 1:
+            self.rngs = [np.random.default_rng(seed)]
+        else:
+            self.rngs = [np.random.default_rng(s) for s in np.random.SeedSequence(seed).spawn(self.replicas)]
+
+
+    def draw(self, bots, sample):
+        """Draws one random value per bot, each from the random stream of its replica, so that every replica
+        of an ensemble evolves exactly as a swarm simulated on its own with the same seed
+
+        Args:
+            bots (array): Kilobot indices
+            sample (callable): Draws a given number of values from a Generator, e.g. rng.uniform
+
+        Returns:
+            array: One value per bot
+        """
+        if self.replicas == 1:
+            return sample(self.rngs[0], len(bots))
+        values = np.empty(len(bots))
+        replicas = self.replica[bots]
+        for replica in np.unique(replicas):
+            drawn = replicas == replica
+            values[drawn] = sample(self.rngs[replica], np.count_nonzero(drawn))
+        return values
+
+
+    @property
+    def period(self):
+        return (self.width, self.height) if self.boundary == "periodic" else None
+
+
+    def neighbor_detect(self, alignment):
+        """Detect neighbours within the detection radius for every bot whose adjust tick has expired and
+        adjust their headings based on alignment. With the "sequential" update order the due bots adjust one
+        at a time in index order, each seeing the headings adjusted before it on the same frame; "simultaneous"
+        adjusts them all from the headings at the start of the frame, in one array pass.
+
+        Args:
+            alignment (int): Alignment mode (0: none, 1: align, -1: anti-align)
+        """
+        due = self.scheduler.pop(DETECT, self.detect_clock)
+        due = np.sort(due[self.next_detect[due] == self.detect_clock])
+        # The adjust tick is reset to ADJUST_TICK and counts down to zero before the next detection
+        self.next_detect[due] = self.detect_clock + self.adjust_tick_frames + 1
+        self.scheduler.schedule(DETECT, self.detect_clock + self.adjust_tick_frames + 1, due)
+        self.detect_clock += 1
+        if not len(due):
+            return
+
+        self.advance(self.frame)
+        if alignment and self.update_order == "sequential":
+            count = self.align_sequentially(due, alignment)
+            found = count > 1
+        else:
+            count, sin_sum, cos_sum = self.neighbor_sums(due)
+            found = count > 1
+            if alignment:
+                avg_sin_theta = np.round(sin_sum[found] / (alignment * (count[found] + 1)), 5)
+                avg_cos_theta = np.round(cos_sum[found] / (alignment * (count[found] + 1)), 5)
+                new_theta = np.arctan2(avg_sin_theta, avg_cos_theta)
+                self.theta[due[found]] = np.where(new_theta < 0, new_theta + 2 * math.pi, new_theta)
+
+        adjusting = due[found]
+
+        # Running bots start an adjust pause this frame; tumbling bots adjust once their tumble ends
+        started = adjusting[~(self.tumbling[adjusting] | self.adjusting[adjusting])]
+        self.adjusting[adjusting] = True
+        self.step_since_adjust[adjusting] = 0
+        self.detected[due] = found
+        self.neighbor_count[due] = np.where(found, count - 1, 0)
+
+        self.start_pause(started, self.frame, self.adjust_frames)
+        self.start_hazard_segment(started, self.frame)
+
+
+    def align_sequentially(self, due, alignment):
+        """Adjusts the headings of the due bots one at a time in index order, each from the current headings of
+        the bots within its detection radius (self included), so that a bot sees the headings adjusted before it
+        on the same frame
+
+        Args:
+            due (array): Sorted indices of the detecting bots
+            alignment (int): Alignment mode (1: align, -1: anti-align)
+
+        Returns:
+            array: Neighbour counts (self included) of the due bots
+        """
+        rows, cols = NeighborIndex(self.x, self.y, self.detect_radius, self.backend, self.period,
+                                   self.groups).query_pairs(due)
+        order = np.lexsort((cols, rows))
+        count = np.bincount(rows, minlength=len(due))
+        ends = np.cumsum(count).tolist()
+        neighbors = cols[order].tolist()
+        theta = self.theta.tolist()
+        sin_theta, cos_theta = np.sin(self.theta).tolist(), np.cos(self.theta).tolist()
+
+        for bot, end, num in zip(due.tolist(), ends, count.tolist()):
+            if num <= 1:
+                continue
+            sin_sum = cos_sum = 0
+            for other in neighbors[end - num:end]:
+                sin_sum += sin_theta[other]
+                cos_sum += cos_theta[other]
+            new_theta = math.atan2(round(sin_sum / (alignment * (num + 1)), 5),
+                                   round(cos_sum / (alignment * (num + 1)), 5))
+            theta[bot] = new_theta + 2 * math.pi if new_theta < 0 else new_theta
+            sin_theta[bot], cos_theta[bot] = math.sin(theta[bot]), math.cos(theta[bot])
+
+        self.theta[due] = np.array(theta)[due]
+        return count
+
+
+    def neighbor_sums(self, index):
+        """Counts the bots (self included) within the detection radius of the given bots and sums their
+        heading components
+
+        Args:
+            index (array): Indices of the querying bots
+
+        Returns:
+            tuple: Neighbour counts, sums of sin(theta) and sums of cos(theta)
+        """
+        rows, cols = NeighborIndex(self.x, self.y, self.detect_radius, self.backend, self.period,
+                                   self.groups).query_pairs(index)
+        count = np.bincount(rows, minlength=len(index))
+        sin_sum = np.bincount(rows, weights=np.sin(self.theta[cols]), minlength=len(index))
+        cos_sum = np.bincount(rows, weights=np.cos(self.theta[cols]), minlength=len(index))
+        return count, sin_sum, cos_sum
+
+
+    def start_pause(self, bots, first_frame, pause_frames, pause_start=None):
+        """Schedules the end of a tumble/adjust pause, which lasts until its counter reaches pause_frames
+
+        Args:
+            bots (array): Kilobot indices
+            first_frame (int): First frame the pause can run on
+            pause_frames (int): Frames the pause lasts (TUMBLE_DELAY or ADJUST_DELAY)
+            pause_start (array, optional): First frame counted by the pause. Defaults to first_frame.
+        """
+        pause_start = first_frame if pause_start is None else pause_start
+        self.pause_start[bots] = pause_start
+        # A pause always runs for at least one frame, as the counter is checked after incrementing
+        self.pause_end[bots] = np.maximum(pause_start + max(pause_frames, 1) - 1, first_frame)
+        self.scheduler.schedule(PAUSE_END, self.pause_end[bots], bots)
+
+
+    def update_states(self):
+        """Sets the status shown for every bot from its tumbling and adjusting flags
+        """
+        tumbling = self.tumbling
+        adjusting = self.adjusting & ~tumbling
+        self.state[tumbling] = TUMBLING
+        self.state[adjusting] = ADJUSTING
+        self.state[~(tumbling | adjusting)] = RUNNING
+
+
+    def events(self):
+        """Ends the tumble/adjust pauses that are due this frame
+        """
+        ended = self.scheduler.pop(PAUSE_END, self.frame)
+        ended = ended[self.pause_end[ended] == self.frame]
+        if not len(ended):
+            return
+
+        # Paused up to and including this frame, running from the next one
+        self.advance(self.frame + 1, ended)
+        ended_tumble = self.tumbling[ended]
+        self.tumbling[ended] = False
+        self.adjusting[ended[~ended_tumble]] = False
+        self.pause_end[ended] = -1
+
+        # Bots detected while tumbling adjust straight after, the rest run again from the next frame (unless
+        # their hazard budget runs out on this frame, in which case they tumble instead)
+        restart = ended[self.adjusting[ended]]
+        self.start_pause(restart, self.frame + 1, self.adjust_frames)
+        resumed = ended[~self.adjusting[ended]]
+        self.start_hazard_segment(resumed[self.tumble_frame[resumed] != self.frame], self.frame + 1)
+
+
+    def tumble(self):
+        """Randomly tumble every bot based on the exponential distribution
+
+        Each frame a bot tumbles with probability 1 - exp(-step_since_tumble / TUMBLE_RATE), so the
+        probability of surviving a sequence of frames is exp(-sum(step_since_tumble) / TUMBLE_RATE). Instead
+        of a Bernoulli draw per bot per frame, every bot draws an Exp(1) hazard budget once per run and
+        tumbles on the frame the accumulated hazard uses it up, which gives exactly the same run-length
+        distribution. That frame is solved for whenever the bot starts running or pausing and kept in the
+        scheduler, so only the bots that tumble are processed, and random numbers are drawn in one batch.
+
+        Returns:
+            array: Indices of the bots that tumbled
+        """
+        tumbled = self.scheduler.pop(TUMBLE, self.frame)
+        tumbled = tumbled[self.tumble_frame[tumbled] == self.frame]
+        if not len(tumbled):
+            return tumbled
+
+        # Running bots still move on the frame they tumble on
+        self.advance(self.frame + 1, tumbled)
+
+        # Tumbling during an adjust pause carries on counting from the adjust pause
+        in_pause = self.pause_end[tumbled] >= 0
+        self.start_pause(tumbled[~in_pause], self.frame + 1, self.tumble_frames)
+        self.start_pause(tumbled[in_pause], self.frame + 1, self.tumble_frames, self.pause_start[tumbled[in_pause]])
+
+        self.tumbling[tumbled] = True
+        self.theta[tumbled] = self.draw(tumbled, lambda rng, size: rng.uniform(0, 2 * math.pi, size))
+        self.step_since_tumble[tumbled] = 0
+        self.tumble_budget[tumbled] = self.draw(tumbled, lambda rng, size: rng.standard_exponential(size))
+        self.segment_start[tumbled] = self.frame + 1
+        self.segment_steps[tumbled] = 0
+        self.tumble_frame[tumbled] = -1
+        return tumbled
+
+
+    def hazard_used(self, bots, frame):
+        """Hazard accumulated by bots from the start of their hazard segment up to (excluding) a frame.
+        While running, step_since_tumble grows by one every frame; otherwise it is frozen.
+        """
+        steps_start, steps_now = self.segment_steps[bots], self.step_since_tumble[bots]
+        frames = frame - self.segment_start[bots]
+        running_steps = steps_now - steps_start
+        used = (steps_now * (steps_now + 1) - steps_start * (steps_start + 1)) / 2 + (frames - running_steps) * steps_now
+        return used / self.tumble_rate
+
+
+    def start_hazard_segment(self, bots, frame):
+        """Spends the hazard accumulated so far and reschedules the next tumble, for bots whose running,
+        pausing or frozen state changes from a frame on
+
+        Args:
+            bots (array): Kilobot indices
+            frame (int): First frame of the new segment
+        """
+        if not len(bots):
+            return
+        if self.hazard_active:
+            self.tumble_budget[bots] -= self.hazard_used(bots, frame)
+        self.segment_start[bots] = frame
+        self.segment_steps[bots] = self.step_since_tumble[bots]
+        if self.hazard_active:
+            self.schedule_tumble(bots)
+
+
+    def schedule_tumble(self, bots):
+        """Solves for and schedules the frame on which each bot's hazard budget runs out, assuming it stays in
+        its current running or paused state
+        """
+        steps = self.segment_steps[bots].astype(float)
+        budget = self.tumble_budget[bots] * self.tumble_rate
+        running = ~(self.tumbling[bots] | self.adjusting[bots])
+
+        # Running: smallest k with k * steps + k * (k + 1) / 2 >= budget; paused: k * steps >= budget
+        b = 2 * steps + 1
+        frames_running = np.ceil((np.sqrt(b ** 2 + 8 * budget) - b) / 2)
+        frames_running += (frames_running * steps + frames_running * (frames_running + 1) / 2) < budget
+        with np.errstate(divide="ignore", invalid="ignore"):
+            frames_paused = np.where(steps > 0, np.ceil(budget / steps), np.inf)
+        frames = np.maximum(np.where(running, frames_running, frames_paused), 1)
+
+        due = np.isfinite(frames)
+        tumble_frame = np.full(len(bots), -1, dtype=np.int64)
+        tumble_frame[due] = self.segment_start[bots[due]] + frames[due].astype(np.int64) - 1
+        self.tumble_frame[bots] = tumble_frame
+        self.scheduler.schedule(TUMBLE, tumble_frame[due], bots[due])
+
+
+    def set_hazard_active(self, active):
+        """Pauses or resumes the tumbling process, which accumulates no hazard while tumbling is deactivated
+        """
+        everyone = np.arange(len(self))
+        if self.hazard_active:
+            self.tumble_budget -= self.hazard_used(everyone, self.frame)
+        self.segment_start[:] = self.frame
+        self.segment_steps[:] = self.step_since_tumble
+        self.hazard_active = active
+        if active:
+            self.schedule_tumble(everyone)
+        else:
+            self.tumble_frame[:] = -1
+            self.scheduler.clear(TUMBLE)
+
+
+    def centre_of_mass(self):
+        """Mean position, or on a periodic domain the circular mean of each co-ordinate, which does not jump
+        when bots wrap around
+        """
+        if self.boundary != "periodic":
+            return self.x.mean(), self.y.mean()
+        return circular_mean(self.x, self.width), circular_mean(self.y, self.height)
+
+
+    def replica_bots(self):
+        """Indices of the bots of every replica, in Kilobot ID order
+
+        Returns:
+            list: One index array per replica
+        """
+        order = np.argsort(self.replica, kind="stable")
+        return np.split(order, np.cumsum(np.bincount(self.replica, minlength=self.replicas))[:-1])
+
+
+    def aggregate(self):
+        """Computes the swarm-level aggregates for the current state
+
+        Returns:
+            SwarmAggregates or ReplicaAggregates: CoM, mean heading and neighbour statistics (per replica for an
+                ensemble)
+        """
+        return SwarmAggregates(self) if self.replicas == 1 else ReplicaAggregates(self)
+
+
+def reflect(values, low, high):
+    """Folds co-ordinates into [low, high] as if reflected off walls at both ends
+
+    Returns:
+        tuple: Folded co-ordinates and whether each was reflected an odd number of times
+    """
+    span = high - low
+    unfolded = np.mod(values - low, 2 * span)
+    flipped = unfolded > span
+    return low + np.where(flipped, 2 * span - unfolded, unfolded), flipped
+
+
+def circular_mean(values, length):
+    """Mean of co-ordinates on a circle of circumference length
+    """
+    angle = values * (2 * math.pi / length)
+    return (math.atan2(np.sin(angle).mean(), np.cos(angle).mean()) % (2 * math.pi)) * length / (2 * math.pi)
+
+
+class SwarmAggregates():
+
+    """Swarm-level quantities computed once per step and shared by the recorder and the on-screen overlay
+    """
+    def __init__(self, swarm) -> None:
+        """Reduce the swarm arrays to centre of mass, mean heading vector and neighbour statistics
+
+        Args:
+            swarm (SwarmState): Swarm to aggregate
+        """
+        self.num_bots = len(swarm)
+        if not self.num_bots:
+            self.com_x = self.com_y = 0
+            self.mean_cos = self.mean_sin = self.order = self.mean_heading = math.nan
+            self.mean_neighbors = math.nan
+            self.zero_neighbors = self.max_neighbors = 0
+            self.state_counts = (0, 0, 0)
+            return
+
+        self.com_x, self.com_y = swarm.centre_of_mass()
+        self.mean_cos = np.cos(swarm.theta).mean()
+        self.mean_sin = np.sin(swarm.theta).mean()
+        self.order = math.hypot(self.mean_cos, self.mean_sin)                  # Vicsek order parameter
+        self.mean_heading = math.atan2(self.mean_sin, self.mean_cos) % (2 * math.pi)
+        self.mean_neighbors = swarm.neighbor_count.mean()
+        self.zero_neighbors = int(np.count_nonzero(swarm.neighbor_count == 0))
+        self.max_neighbors = int(swarm.neighbor_count.max())
+        self.state_counts = tuple(np.bincount(swarm.state, minlength=3).tolist())
+
+
+class ReplicaAggregates():
+
+    """Swarm-level quantities of every replica of an ensemble, each reduced for all replicas at once: along
+    rows when the replicas hold equal consecutive blocks of bots (as spawned), which sums in the same order as
+    a single run and so gives identical values, otherwise with bincount over the replica ids. Indexing gives
+    the SwarmAggregates of one replica.
+    """
+    def __init__(self, swarm) -> None:
+        """Reduce the swarm arrays per replica
+
+        Args:
+            swarm (SwarmState): Ensemble swarm to aggregate
+        """
+        replicas, replica = swarm.replicas, swarm.replica
+        self.num_bots = np.bincount(replica, minlength=replicas)
+        empty = self.num_bots == 0
+
+        blocks = (len(replica) % replicas == 0 and
+                  np.array_equal(replica, np.repeat(np.arange(replicas), len(replica) // replicas)))
+
+        def mean(values):
+            if blocks:
+                return values.reshape(replicas, -1).mean(axis=1)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                return np.bincount(replica, values, replicas) / self.num_bots
+
+        if swarm.boundary == "periodic":
+            com = []
+            for values, length in ((swarm.x, swarm.width), (swarm.y, swarm.height)):
+                angle = values * (2 * math.pi / length)
+                centre = np.array([math.atan2(sin, cos) for sin, cos in zip(mean(np.sin(angle)), mean(np.cos(angle)))])
+                com.append(centre % (2 * math.pi) * length / (2 * math.pi))
+            self.com_x, self.com_y = com
+        else:
+            self.com_x, self.com_y = mean(swarm.x), mean(swarm.y)
+        self.com_x[empty] = self.com_y[empty] = 0
+        self.mean_cos = mean(np.cos(swarm.theta))
+        self.mean_sin = mean(np.sin(swarm.theta))
+        # The scalar math functions of a single run, which can round differently from their numpy ufuncs
+        self.order = np.array([math.hypot(cos, sin) for cos, sin in zip(self.mean_cos, self.mean_sin)])
+        heading = [math.atan2(sin, cos) for cos, sin in zip(self.mean_cos, self.mean_sin)]
+        self.mean_heading = np.array(heading) % (2 * math.pi)
+        self.mean_neighbors = mean(swarm.neighbor_count)
+        self.zero_neighbors = np.bincount(replica, swarm.neighbor_count == 0, replicas).astype(int)
+        self.max_neighbors = np.zeros(replicas, dtype=int)
+        np.maximum.at(self.max_neighbors, replica, swarm.neighbor_count)
+        self.state_counts = np.bincount(replica * 3 + swarm.state, minlength=3 * replicas).reshape(replicas, 3)
+
+
+    def __len__(self):
+        return len(self.num_bots)
+
+
+    def __getitem__(self, replica):
+        aggregates = SwarmAggregates.__new__(SwarmAggregates)
+        for name in ("num_bots", "com_x", "com_y", "mean_cos", "mean_sin", "order", "mean_heading",
+                     "mean_neighbors", "zero_neighbors", "max_neighbors"):
+            setattr(aggregates, name, getattr(self, name)[replica].item())
+        aggregates.state_counts = tuple(self.state_counts[replica].tolist())
+        return aggregates
+
+
+def _array_property(name):
+
+    def getter(self):
+        return getattr(self.swarm, name)[self.index].item()
+
+    return property(getter)
+
+
+class KilobotView():
+
+    """Read-only view of one index of a SwarmState, with the attributes of a Kilobot, so that code reading
+    per-bot state keeps working. The swarm is only advanced by its batched step: its timers are driven by the
+    scheduler, trails live in the bounded trail buffer and colour sequences are updated by the batched
+    estimators in sensing, so the view has none of the Kilobot methods that update a bot.
+    """
+    def __init__(self, swarm, index) -> None:
+        """Create the view
+
+        Args:
+            swarm (SwarmState): Swarm holding this bot's state
+            index (int): Kilobot ID
+        """
+        self.swarm = swarm
+        self.index = index
+
+    x = _array_property("x")
+    y = _array_property("y")
+    theta = _array_property("theta")
+    step_since_tumble = _array_property("step_since_tumble")
+    step_since_adjust = _array_property("step_since_adjust")
+    neighbor_count = _array_property("neighbor_count")
+    tumbling = _array_property("tumbling")
+    adjusting = _array_property("adjusting")
+    est_heading = _array_property("est_heading")
+    heading_error = _array_property("heading_error")
+    x_vel = _array_property("x_vel")
+    y_vel = _array_property("y_vel")
+
+    @property
+    def sequence(self):
+        codes = self.swarm.color_sequence[self.index]
+        return codes[codes >= 0].tolist()
+
+    @property
+    def detected_color(self):
+        return self.sequence[-1] if self.sequence else ()
+
+    def convert_sequence(self):
+        """The colour sequence is sensed as ENUM_COLOR codes already (see sensing.update_color_sequences)
+        """
+        return self.sequence
+
+    @property
+    def trail(self):
+        return [tuple(point) for point in self.swarm.trails.trail(self.index).tolist()]
+
+    @property
+    def step_since_run(self):
+        return int(self.swarm.step_since_run[self.index])
+
+    @property
+    def adjust_tick(self):
+        return int(self.swarm.adjust_tick[self.index])
+
+    @property
+    def status(self):
+        return STATUS_COLORS[int(self.swarm.state[self.index])]
+
+    @property
+    def detection(self):
+        return DETECTION_COLORS[int(self.swarm.detected[self.index])]
@@ -0,0 +1,239 @@
+import argparse
+import copy
+import itertools
+import json
+import os
+import shutil
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from kilobots import load_config
+from recorder import EXTENSIONS
+from simulation import run_headless
+from ensemble import run_ensemble
+
+MANIFEST = "manifest.json"
+
+
+def set_config_value(config, key, value):
+    """Sets a key in whichever configuration section ("simulation" or "kilobots") defines it
+
+    Args:
+        config (dict): Configuration in the layout of Data/config.json
+        key (str): Configuration key, e.g. "adjust_rate"
+        value: New value
+    """
+    for section in config.values():
+        if key in section:
+            section[key] = value
+            return
+    raise KeyError(f"'{key}' is not a configuration key")
+
+
+def sweep_points(config, grid, seeds, output_dir, fork=None):
+    """Expands a parameter grid into one tagged run per combination and seed
+
+    Args:
+        config (dict): Base configuration
+        grid (dict): Configuration key mapped to the list of values to sweep
+        seeds (list): Seeds to run every combination with
+        output_dir (str): Directory receiving the run outputs
+        fork (str, optional): Checkpoint every run is forked from. Defaults to None (spawn new swarms).
+
+    Returns:
+        list: Run descriptions (tag, params, seed, path and the run's configuration)
+    """
+    keys = list(grid)
+    points = []
+
+    for values in itertools.product(*(grid[key] for key in keys)):
+        params = dict(zip(keys, values))
+        for seed in seeds:
+            tag = "_".join([config["simulation"]["name"]] + [f"{key}={value}" for key, value in params.items()] + [f"seed={seed}"])
+            run_config = copy.deepcopy(config)
+            for key, value in params.items():
+                set_config_value(run_config, key, value)
+            run_config["simulation"]["name"] = tag
+            extension = EXTENSIONS[run_config["simulation"].get("record_format", "csv")]
+            points.append({
+                "tag": tag,
+                "params": params,
+                "seed": seed,
+                "path": os.path.join(output_dir, f"sim_data_{tag}{extension}"),
+                "metrics_path": os.path.join(output_dir, f"metrics_{tag}.csv"),
+                "config": run_config,
+                "fork": fork,
+            })
+
+    return points
+
+
+def run_point(point):
+    """Runs one sweep point headless, writing its output through a temporary file so that an interrupted
+    run never leaves a complete-looking output behind
+
+    Args:
+        point (dict): Run description from sweep_points
+
+    Returns:
+        dict: Manifest entry for the run
+    """
+    entry = {key: point[key] for key in ("tag", "params", "seed", "path")}
+    start = time.perf_counter()
+    try:
+        run_headless(point["config"], point["seed"], point["path"] + ".part", point["metrics_path"],
+                     fork=point.get("fork"))
+        publish(point)
+        entry["status"] = "done"
+    except Exception:
+        entry["status"] = "failed"
+        entry["error"] = traceback.format_exc()
+    entry["elapsed"] = round(time.perf_counter() - start, 3)
+    return entry
+
+
+def run_ensemble_points(points):
+    """Runs sweep points that differ only in their seed as one ensemble in a single process (see ensemble),
+    with the same outputs as running them one by one
+
+    Args:
+        points (list): Run descriptions from sweep_points of one parameter combination
+
+    Returns:
+        list: Manifest entry for every run
+    """
+    entries = [{key: point[key] for key in ("tag", "params", "seed", "path")} for point in points]
+    start = time.perf_counter()
+    try:
+        run_ensemble(points[0]["config"], [point["seed"] for point in points],
+                     [point["path"] + ".part" for point in points], [point["metrics_path"] for point in points])
+        for point in points:
+            publish(point)
+        status = {"status": "done"}
+    except Exception:
+        status = {"status": "failed", "error": traceback.format_exc()}
+    for entry in entries:
+        entry.update(status, elapsed=round(time.perf_counter() - start, 3))
+    return entries
+
+
+def publish(point):
+    """Moves a finished run's output from its temporary path into place
+    """
+    if os.path.isdir(point["path"]):
+        shutil.rmtree(point["path"])
+    os.replace(point["path"] + ".part", point["path"])
+
+
+def load_manifest(output_dir):
+    path = os.path.join(output_dir, MANIFEST)
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as f:
+        return {entry["tag"]: entry for entry in json.load(f)["runs"]}
+
+
+def write_manifest(output_dir, config, grid, seeds, entries):
+    """Writes the sweep manifest atomically so that it always reflects the completed runs
+
+    Args:
+        output_dir (str): Directory receiving the run outputs
+        config (dict): Base configuration
+        grid (dict): Swept configuration keys and values
+        seeds (list): Swept seeds
+        entries (dict): Manifest entry per run tag
+    """
+    path = os.path.join(output_dir, MANIFEST)
+    manifest = {"config": config, "grid": grid, "seeds": seeds, "runs": list(entries.values())}
+    with open(path + ".part", 'w') as f:
+        json.dump(manifest, f, indent=4)
+    os.replace(path + ".part", path)
+
+
+def run_sweep(config, grid, seeds, output_dir, workers=None, resume=False, fork=None, ensemble=False):
+    """Runs every combination of a parameter grid and seed across a process pool
+
+    Args:
+        config (dict): Base configuration
+        grid (dict): Configuration key mapped to the list of values to sweep
+        seeds (list): Seeds to run every combination with
+        output_dir (str): Directory receiving one output per run and the manifest
+        workers (int, optional): Number of worker processes. Defaults to the number of cores.
+        resume (bool, optional): Skip runs the manifest already records as done. Defaults to False.
+        fork (str, optional): Checkpoint to fork every run from, skipping the shared warm-up. Defaults to None.
+        ensemble (bool, optional): Run the seeds of every combination as one ensemble per worker, which saves
+            the per-run overhead of small swarms. Defaults to False.
+
+    Returns:
+        dict: Manifest entry per run tag
+    """
+    if ensemble and fork is not None:
+        raise ValueError("Ensemble sweeps spawn their replicas and cannot be forked from a checkpoint")
+    os.makedirs(output_dir, exist_ok=True)
+    points = sweep_points(config, grid, seeds, output_dir, fork)
+    entries = load_manifest(output_dir) if resume else {}
+
+    pending = [point for point in points
+               if not (entries.get(point["tag"], {}).get("status") == "done" and os.path.exists(point["path"]))]
+    print(f"{len(points)} runs, {len(points) - len(pending)} already done, {len(pending)} to run")
+
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        if ensemble:
+            combinations = {}
+            for point in pending:
+                combinations.setdefault(json.dumps(point["params"], sort_keys=True), []).append(point)
+            futures = [executor.submit(run_ensemble_points, points) for points in combinations.values()]
+        else:
+            futures = [executor.submit(run_point, point) for point in pending]
+
+        completed = 0
+        for future in as_completed(futures):
+            for entry in future.result() if ensemble else [future.result()]:
+                completed += 1
+                entries[entry["tag"]] = entry
+                print(f"[{completed}/{len(pending)}] {entry['tag']} {entry['status']} in {entry['elapsed']}s")
+                if entry["status"] == "failed":
+                    print(entry["error"])
+            write_manifest(output_dir, config, grid, seeds, entries)
+
+    return entries
+
+
+def parse_grid(specs):
+    """Parses KEY=V1,V2,... specifications, reading each value as JSON (so numbers and booleans keep their type)
+
+    Args:
+        specs (list): Grid specifications
+
+    Returns:
+        dict: Configuration key mapped to the list of values to sweep
+    """
+    grid = {}
+    for spec in specs:
+        key, values = spec.split("=", 1)
+        grid[key] = [json.loads(value) for value in values.split(",")]
+    return grid
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a parameter sweep of headless simulations across all cores")
+    parser.add_argument("--config", default="Data/config.json", help="Path to the base simulation configuration")
+    parser.add_argument("--grid", action="append", default=[], metavar="KEY=V1,V2,...",
+                        help="Configuration key and values to sweep (repeatable), e.g. adjust_rate=1000,5000,10000")
+    parser.add_argument("--seeds", type=int, nargs="+", default=[0], help="Seeds to run every combination with")
+    parser.add_argument("--output", default="Data/Simulation/sweep", help="Directory for run outputs and the manifest")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes (default: all cores)")
+    parser.add_argument("--resume", action="store_true", help="Skip runs the manifest already records as done")
+    parser.add_argument("--fork", default=None, metavar="CHECKPOINT",
+                        help="Fork every run from a warmed-up checkpoint instead of spawning a new swarm")
+    parser.add_argument("--ensemble", action="store_true",
+                        help="Simulate the seeds of every combination together as one ensemble per worker")
+    args = parser.parse_args()
+
+    run_sweep(load_config(args.config), parse_grid(args.grid), args.seeds, args.output, args.workers, args.resume,
+              args.fork, args.ensemble)
+
+
+if __name__ == "__main__":
+
+    main()
@@ -0,0 +1,93 @@
+import math
+import time
+
+RATE_WINDOW = 1.0               # Seconds of wall-clock time the achieved steps per second are measured over
+
+
+class FixedTimestep():
+
+    """Decouples the physics rate from the render rate. Wall-clock time between rendered frames, scaled by the
+    requested speed, is accumulated and spent in whole physics steps of fixed length, so the display rate never
+    changes the simulated dynamics. Alternatively, a fixed number of steps can be taken per rendered frame.
+
+    Physics steps between two frames stop once a frame's worth of wall-clock time has been spent on them (and
+    the backlog is dropped), so the display keeps refreshing when the requested speed cannot be reached.
+    """
+    def __init__(self, step_time, frame_time, time_scale=1.0, steps_per_frame=None) -> None:
+        """Create the step clock
+
+        Args:
+            step_time (float): Simulated seconds per physics step
+            frame_time (float): Wall-clock seconds per rendered frame
+            time_scale (float, optional): Simulated seconds per wall-clock second (math.inf runs as fast as
+                possible). Defaults to 1.0 (real time).
+            steps_per_frame (int, optional): Take exactly this many steps per rendered frame, i.e. render every
+                k-th step, ignoring time_scale. Defaults to None.
+        """
+        if time_scale <= 0:
+            raise ValueError(f"Time scale must be positive, got {time_scale}")
+        if steps_per_frame is not None and steps_per_frame < 1:
+            raise ValueError(f"Steps per frame must be at least 1, got {steps_per_frame}")
+
+        self.step_time = step_time
+        self.frame_time = frame_time
+        self.time_scale = time_scale
+        self.steps_per_frame = steps_per_frame
+        self.accumulator = 0.0
+        self.last = time.perf_counter()
+
+        self.rate = 0.0                 # Achieved physics steps per wall-clock second
+        self.window_start = self.last
+        self.window_steps = 0
+
+
+    @property
+    def speed(self):
+        """Achieved simulated seconds per wall-clock second
+        """
+        return self.rate * self.step_time
+
+
+    def ticks(self):
+        """Yields once per physics step to take before rendering the next frame
+        """
+        now = time.perf_counter()
+        elapsed, self.last = now - self.last, now
+
+        if self.steps_per_frame is not None:
+            steps, deadline = self.steps_per_frame, math.inf
+        elif math.isinf(self.time_scale):
+            steps, deadline = math.inf, now + self.frame_time
+        else:
+            self.accumulator += elapsed * self.time_scale
+            steps, deadline = int(self.accumulator / self.step_time), now + self.frame_time
+
+        taken = 0
+        while taken < steps and (taken == 0 or time.perf_counter() < deadline):
+            yield taken
+            taken += 1
+
+        if taken < steps:
+            # Behind the requested speed: drop the backlog rather than spiral further behind
+            self.accumulator = 0.0
+        elif not math.isinf(steps):
+            self.accumulator = max(self.accumulator - taken * self.step_time, 0.0)
+        self.count(taken)
+
+
+    def reset(self):
+        """Discards the accumulated time, e.g. while paused
+        """
+        self.accumulator = 0.0
+        self.last = time.perf_counter()
+
+
+    def count(self, steps):
+        """Counts the physics steps taken, updating the achieved rate once per RATE_WINDOW
+        """
+        self.window_steps += steps
+        elapsed = self.last - self.window_start
+        if elapsed >= RATE_WINDOW:
+            self.rate = self.window_steps / elapsed
+            self.window_start = self.last
+            self.window_steps = 0
@@ -0,0 +1,89 @@
+import numpy as np
+
+
+class TrailBuffer():
+
+    """Fixed-capacity ring buffer of the most recent running positions of every Kilobot, held in one shared
+    (bots, capacity, 2) array so that memory stays flat however long the simulation runs
+    """
+    def __init__(self, capacity, decimation=1) -> None:
+        """Create an empty trail buffer
+
+        Args:
+            capacity (int): Positions kept per bot (0 disables trails)
+            decimation (int, optional): Keep every n-th running frame of each bot. Defaults to 1.
+        """
+        if decimation < 1:
+            raise ValueError(f"Trail decimation must be at least 1, got {decimation}")
+
+        self.capacity = max(int(capacity), 0)
+        self.decimation = int(decimation)
+        self.points = np.empty((0, self.capacity, 2), dtype=np.float32)
+        self.head = np.empty(0, dtype=np.int64)         # Slot the next position of each bot is written to
+        self.count = np.empty(0, dtype=np.int64)        # Positions held per bot
+        self.ticks = np.empty(0, dtype=np.int64)        # Running frames seen per bot, for decimation
+
+
+    def __len__(self):
+        return len(self.head)
+
+
+    @property
+    def enabled(self):
+        return self.capacity > 0
+
+
+    def extend(self, num_bots):
+        """Adds empty trails for newly added bots
+        """
+        self.points = np.concatenate((self.points, np.zeros((num_bots, self.capacity, 2), dtype=np.float32)))
+        self.head = np.concatenate((self.head, np.zeros(num_bots, dtype=np.int64)))
+        self.count = np.concatenate((self.count, np.zeros(num_bots, dtype=np.int64)))
+        self.ticks = np.concatenate((self.ticks, np.zeros(num_bots, dtype=np.int64)))
+
+
+    def append(self, bots, x, y):
+        """Records one running frame for a batch of bots, overwriting their oldest positions once full
+
+        Args:
+            bots (array): Kilobot indices
+            x (array): X co-ordinates of those bots
+            y (array): Y co-ordinates of those bots
+        """
+        if not self.enabled or not len(bots):
+            return
+        if self.decimation > 1:
+            kept = self.ticks[bots] % self.decimation == 0
+            self.ticks[bots] += 1
+            bots, x, y = bots[kept], x[kept], y[kept]
+
+        head = self.head[bots]
+        self.points[bots, head, 0] = x
+        self.points[bots, head, 1] = y
+        self.head[bots] = (head + 1) % self.capacity
+        self.count[bots] = np.minimum(self.count[bots] + 1, self.capacity)
+
+
+    def trail(self, index):
+        """Positions of one bot, oldest first
+
+        Args:
+            index (int): Kilobot ID
+
+        Returns:
+            array: (positions, 2) array of x and y co-ordinates
+        """
+        count = self.count[index]
+        slots = (self.head[index] - count + np.arange(count)) % max(self.capacity, 1)
+        return self.points[index, slots]
+
+
+    def get_state(self):
+        return {"points": self.points, "head": self.head, "count": self.count, "ticks": self.ticks}
+
+
+    def set_state(self, state):
+        self.points = np.array(state["points"], dtype=np.float32)
+        self.head = np.array(state["head"], dtype=np.int64)
+        self.count = np.array(state["count"], dtype=np.int64)
+        self.ticks = np.array(state["ticks"], dtype=np.int64)
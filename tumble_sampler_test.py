@@ -0,0 +1,98 @@
+import copy
+import math
+import numpy as np
+from scipy.stats import chisquare
+from kilobots import load_config
+from swarm import SwarmState
+
+TUMBLE_RATE = 500           # Small rate (mean run of ~28 frames) so the test collects many runs quickly
+NUM_BOTS = 5000
+FRAMES = 600
+CUTOFF = 300                # Only runs starting before FRAMES - CUTOFF count, so no run is cut short by the end
+ALPHA = 1e-3
+
+
+def sampler_config():
+    config = copy.deepcopy(load_config())
+    config["kilobots"]["tumble_rate"] = TUMBLE_RATE
+    return config
+
+
+def hazard_pmf(hazards):
+    """Distribution of the draw at which the first tumble happens, for a sequence of per-draw tumble
+    probabilities (the final entry collects every later draw)
+    """
+    survival = np.concatenate(([1], np.cumprod(1 - hazards)))
+    return np.append(survival[:-1] * hazards, survival[-1])
+
+
+def binned_chisquare(observed, expected, min_expected=5):
+    """Chi-square goodness of fit after merging the tail bins that expect fewer than min_expected counts
+    """
+    keep = np.flatnonzero(expected >= min_expected)
+    last = keep[-1]
+    observed = np.append(observed[:last], observed[last:].sum())
+    expected = np.append(expected[:last], expected[last:].sum())
+    return chisquare(observed, expected * observed.sum() / expected.sum())
+
+
+def test_run_lengths():
+    """Running bots: the number of running frames until a tumble matches the hazard
+    1 - exp(-step_since_tumble / TUMBLE_RATE) drawn every frame
+    """
+    swarm = SwarmState(NUM_BOTS, sampler_config(), seed=1)
+    run_start = np.zeros(NUM_BOTS)
+    run_lengths = []
+
+    for frame in range(FRAMES):
+        steps = swarm.step_since_tumble + 1
+        swarm.step(0, detecting=False, tumbling=True)
+        tumbled = swarm.tumbled
+        complete = tumbled[run_start[tumbled] < FRAMES - CUTOFF]
+        run_lengths.append(steps[complete])
+        run_start[tumbled] = frame
+
+    run_lengths = np.concatenate(run_lengths)
+    max_length = run_lengths.max()
+    steps = np.arange(1, max_length + 1)
+    expected = hazard_pmf(1 - np.exp(-(1 / TUMBLE_RATE) * steps))[:-1] * len(run_lengths)
+    observed = np.bincount(run_lengths, minlength=max_length + 1)[1:]
+
+    result = binned_chisquare(observed, expected)
+    print(f"Run lengths: {len(run_lengths)} runs, chi-square p = {result.pvalue:.3f}")
+    assert result.pvalue > ALPHA
+
+
+def test_frozen_hazard():
+    """Adjusting bots keep drawing at their frozen step_since_tumble, so the frames until a tumble are
+    geometric with probability 1 - exp(-step_since_tumble / TUMBLE_RATE)
+    """
+    steps_frozen = 20
+    config = sampler_config()
+    config["kilobots"]["adjust_delay"] = 1e9
+    swarm = SwarmState(NUM_BOTS, config, seed=2)
+    swarm.detect_radius = math.inf
+    for frame in range(steps_frozen):
+        swarm.step(0, detecting=False, tumbling=False)
+
+    # Every bot detects its neighbours and starts adjusting with step_since_tumble frozen at steps_frozen
+    waits = np.full(NUM_BOTS, -1)
+    for frame in range(1, FRAMES + 1):
+        swarm.step(0, detecting=True, tumbling=True)
+        tumbled = swarm.tumbled
+        waits[tumbled[waits[tumbled] < 0]] = frame
+
+    waits = waits[waits > 0]
+    probability = 1 - np.exp(-steps_frozen / TUMBLE_RATE)
+    expected = hazard_pmf(np.full(waits.max(), probability))[:-1] * len(waits)
+    observed = np.bincount(waits, minlength=waits.max() + 1)[1:]
+
+    result = binned_chisquare(observed, expected)
+    print(f"Frozen hazard: {len(waits)} waits, chi-square p = {result.pvalue:.3f}")
+    assert result.pvalue > ALPHA
+
+
+if __name__ == "__main__":
+
+    test_run_lengths()
+    test_frozen_hazard()